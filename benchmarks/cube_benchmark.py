@@ -0,0 +1,212 @@
+"""Cube build, filter and query benchmarks for the example models at several data scales
+
+    python benchmarks/cube_benchmark.py --models pnl adventureworks --scales 1 5 20 --output results.json
+
+P&L data is generated with synthetic_generator.py at each scale factor (scale 1 uses the
+shipped tables); pnl_rollup builds the P&L cube from rollups.py tables instead; AdventureWorks replicates the Sales table. Each (model, scale) runs in its
+own process, so the peak RSS reported is that scenario's alone. Results are JSON, to be
+compared across versions.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+pnl_dir = os.path.join(repo_dir, 'synthetic', 'pnl')
+adventureworks_dir = os.path.join(repo_dir, 'kaggle', 'adventureworks')
+
+MODELS = ['pnl', 'pnl_rollup', 'adventureworks']
+
+# Dimensions filtered in the filter benchmark (each on the first half of its sorted members)
+FILTER_DIMENSIONS = {
+    'pnl': [['business_unit'], ['month_year'], ['segment', 'region']],
+    'pnl_rollup': [['business_unit'], ['month_year'], ['division', 'pnl_category']],
+    'adventureworks': [['Category'], ['Region'], ['Business Type', 'Color']],
+}
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def _timings_ms(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _summary(samples):
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'runs': len(samples),
+    }
+
+
+def load_pnl(scale_factor, workdir):
+    """P&L tables at a scale factor, ready for the cube, and the model definitions"""
+    sys.path[:0] = [pnl_dir, os.path.join(pnl_dir, 'data')]
+    from tables import LazyTables, data_dir
+    from synthetic_generator import generate_synthetic_data
+    import model
+
+    directory = data_dir
+    if scale_factor != 1:
+        directory = workdir
+        generate_synthetic_data('2023-01-01', '2023-12-31', scale_factor=scale_factor,
+                                output_dir=directory, output_format='parquet')
+    tables = dict(LazyTables(directory, use_cache=False).preload())
+    return tables, model.prepare_tables, model.define_metrics_and_queries
+
+
+def load_pnl_rollup(scale_factor, workdir):
+    """The P&L tables at a scale factor, for the cube answering the report from month x BU x account rollups"""
+    tables, _, define = load_pnl(scale_factor, workdir)
+    import model
+    return tables, model.prepare_rollup_tables, define
+
+
+def load_adventureworks(scale_factor, workdir):
+    """AdventureWorks tables with Sales replicated `scale_factor` times, and the model definitions"""
+    import pandas as pd
+    sys.path.insert(0, adventureworks_dir)
+    from sources import load_tables
+    import model
+
+    tables = load_tables()
+    sales = tables['Sales']
+    if scale_factor != 1:
+        # Copies keep distinct order numbers so distinct counts grow with the data
+        copies = [sales.assign(SalesOrderNumber=sales['SalesOrderNumber'] + f'-{k}') for k in range(scale_factor)]
+        tables['Sales'] = pd.concat(copies, ignore_index=True)
+    return tables, dict, model.define_metrics_and_queries
+
+
+LOADERS = {'pnl': load_pnl, 'pnl_rollup': load_pnl_rollup, 'adventureworks': load_adventureworks}
+
+
+def run_scenario(model_name, scale_factor, repeat):
+    """Measure one model at one scale in this process"""
+    from cube_alchemy import Hypercube
+
+    workdir = tempfile.mkdtemp(prefix=f'cube_benchmark_{model_name}_')
+    try:
+        result = {'model': model_name, 'scale_factor': scale_factor}
+        # cube_alchemy and the generator report progress on stdout, which carries the result here
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            tables, prepare, define = LOADERS[model_name](scale_factor, workdir)
+            result['load_s'] = round(time.perf_counter() - start, 3)
+
+            start = time.perf_counter()
+            tables = prepare(tables)
+            result['prepare_s'] = round(time.perf_counter() - start, 3)
+            result['rows'] = {name: len(df) for name, df in tables.items()}
+
+            start = time.perf_counter()
+            cube = Hypercube(tables)
+            result['build_s'] = round(time.perf_counter() - start, 3)
+            define(cube)
+
+            result['filters'] = []
+            for dims in FILTER_DIMENSIONS[model_name]:
+                criteria = {}
+                for dim in dims:
+                    members = cube.dimension(dim).dropna().sort_values().unique().tolist()
+                    criteria[dim] = members[:max(1, len(members) // 2)]
+                samples = _timings_ms(lambda: cube.filter(criteria), repeat, setup=lambda: cube.reset_filters('all'))
+                result['filters'].append({'dimensions': dims, 'members': {d: len(v) for d, v in criteria.items()}, **_summary(samples)})
+            cube.reset_filters('all')
+
+            result['queries'] = {}
+            for query_name in cube.queries:
+                rows = len(cube.query(query_name))
+                result['queries'][query_name] = {'rows': rows, **_summary(_timings_ms(lambda: cube.query(query_name), repeat))}
+
+        result['peak_rss_mb'] = _peak_rss_mb()
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _environment():
+    from importlib.metadata import version, PackageNotFoundError
+
+    def package_version(name):
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return None
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo_dir, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {name: package_version(name) for name in ['cube-alchemy', 'pandas', 'numpy', 'pyarrow']},
+    }
+
+
+def run_benchmarks(models=MODELS, scales=(1, 5, 20), repeat=20):
+    """Run every (model, scale) scenario in a fresh interpreter and collect the results"""
+    results = []
+    for model_name in models:
+        for scale_factor in scales:
+            print(f"{model_name} x{scale_factor}...", file=sys.stderr, flush=True)
+            command = [sys.executable, os.path.abspath(__file__), '--worker', model_name, str(scale_factor), '--repeat', str(repeat)]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode == 0:
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                queries = ', '.join(f"{q} p50 {r['p50_ms']:.1f} ms" for q, r in result['queries'].items())
+                print(f"  build {result['build_s']:.2f} s, peak RSS {result['peak_rss_mb']} MB; {queries}", file=sys.stderr)
+            else:
+                result = {'model': model_name, 'scale_factor': scale_factor, 'error': completed.stderr.strip().splitlines()[-1:]}
+                print(f"  failed: {result['error']}", file=sys.stderr)
+            results.append(result)
+    return {'environment': _environment(), 'repeat': repeat, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark cube build, filter and query latency of the example models')
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS, help='Models to benchmark')
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 5, 20], help='Scale factors to run each model at')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per filter and per query')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON here instead of stdout')
+    parser.add_argument('--worker', nargs=2, metavar=('MODEL', 'SCALE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(args.worker[0], int(args.worker[1]), args.repeat)))
+    else:
+        report = run_benchmarks(args.models, args.scales, args.repeat)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
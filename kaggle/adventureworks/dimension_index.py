@@ -0,0 +1,78 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+class DimensionIndex:
+    """Sorted distinct values of every cube dimension, built once and shared
+
+    Filter widgets read their options from here instead of deduplicating and
+    sorting the Unfiltered dimension on every rerun. search() pages through
+    prefix or substring matches, so very large dimensions can be browsed
+    without sending every member to the browser.
+    """
+
+    def __init__(self, cube, dimensions=None):
+        self._members = {}   # dimension -> sorted distinct values (object array)
+        self._keys = {}      # dimension -> (lower-cased text of the values, the same sorted, order that sorts it)
+        self._lock = threading.Lock()
+        for dim in (cube.get_dimensions() if dimensions is None else dimensions):
+            values = cube.dimensions([dim], context_state_name='Unfiltered')[dim]
+            self._members[dim] = self._sorted_distinct(values)
+
+    @staticmethod
+    def _sorted_distinct(values):
+        distinct = pd.Series(values.dropna().unique())
+        try:
+            distinct = distinct.sort_values(ignore_index=True)
+        except TypeError:
+            # Mixed types don't compare; order them by their text instead
+            distinct = distinct.iloc[np.argsort(distinct.astype(str).to_numpy(), kind='stable')].reset_index(drop=True)
+        return distinct.to_numpy(dtype=object)
+
+    def __contains__(self, dim):
+        return dim in self._members
+
+    def dimensions(self):
+        return list(self._members)
+
+    def count(self, dim):
+        return len(self._members[dim])
+
+    def values(self, dim, offset=0, limit=None):
+        """Sorted distinct values of a dimension, optionally one page of them"""
+        members = self._members[dim]
+        stop = None if limit is None else offset + limit
+        return members[offset:stop].tolist()
+
+    def _text_keys(self, dim):
+        # Built on the first search of a dimension only
+        with self._lock:
+            if dim not in self._keys:
+                text = pd.Series(self._members[dim]).astype(str).str.lower().to_numpy(dtype=str)
+                order = np.argsort(text, kind='stable')
+                self._keys[dim] = (text, text[order], order)
+            return self._keys[dim]
+
+    def search(self, dim, text='', mode='prefix', offset=0, limit=100):
+        """One page of the values matching `text` (case-insensitive) and the total number of matches
+
+        mode='prefix' is a binary search over the sorted text keys; mode='contains'
+        scans them with a vectorized substring match.
+        """
+        members = self._members[dim]
+        if not text:
+            return self.values(dim, offset, limit), len(members)
+        keys, sorted_keys, order = self._text_keys(dim)
+        needle = text.lower()
+        if mode == 'prefix':
+            start = np.searchsorted(sorted_keys, needle, side='left')
+            stop = np.searchsorted(sorted_keys, needle + '\U0010ffff', side='left')
+            # Back to the dimension's own order, so pages read like the full list
+            matches = np.sort(order[start:stop])
+        elif mode == 'contains':
+            matches = np.flatnonzero(np.char.find(keys, needle) >= 0)
+        else:
+            raise ValueError(f"Unsupported search mode '{mode}'")
+        page = matches[offset:offset + limit]
+        return members[page].tolist(), len(matches)
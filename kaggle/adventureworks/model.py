@@ -0,0 +1,65 @@
+from cube_alchemy import Hypercube
+
+
+def define_variant(cube: Hypercube, base: str, name: str, **changes):
+    """Define metric `name` with the arguments of metric `base`, some of them changed (e.g. ignore_dimensions=True)"""
+    metric = cube.metrics[base]
+    arguments = {
+        'expression': metric.expression,
+        'aggregation': metric.aggregation,
+        'metric_filters': metric.metric_filters,
+        'row_condition_expression': metric.row_condition_expression,
+        'context_state_name': metric.context_state_name,
+        'ignore_dimensions': metric.ignore_dimensions,
+        'fillna': metric.fillna,
+    }
+    cube.define_metric(name=name, **{**arguments, **changes})
+
+
+def define_metrics_and_queries(cube: Hypercube):
+    """Metrics, computed metrics and queries of the AdventureWorks explorer"""
+
+    def count_distinct(x):
+        return x.nunique()
+    
+    # Base metrics
+    cube.define_metric(name='Revenue', expression='[Unit Price] * [Quantity]', aggregation='sum')
+    cube.define_metric(name='Unfiltered Revenue', expression='[Unit Price] * [Quantity]', aggregation='sum', context_state_name='Unfiltered')
+    cube.define_metric(name='Cost',    expression='[Cost]',                 aggregation='sum')
+    cube.define_metric(name='avg Unit Price', expression='[Unit Price]',    aggregation='mean')
+    cube.define_metric(name='number of Orders', expression='[SalesOrderNumber]', aggregation=count_distinct)
+
+    # Or as a variant of a base metric
+    define_variant(cube, 'Revenue', 'Total Revenue', ignore_dimensions=True)
+
+    # Computed metrics (post-aggregation)
+    cube.define_computed_metric(name='Margin', expression='[Revenue] - [Cost]')
+    cube.define_computed_metric(name='Margin %', expression='100 * ([Revenue] - [Cost]) / [Revenue]')
+    cube.define_computed_metric(name='Revenue over Total', expression='[Revenue] / [Total Revenue]')
+
+    # Queries
+    cube.define_query(
+        name='Sales by Region and Category',
+        metrics=['Revenue'],
+        computed_metrics=['Revenue over Total','Margin %'],
+        dimensions=['Region', 'Category'],
+        drop_null_dimensions=True,
+        sort=[('Revenue', 'desc')]
+    )
+
+    cube.define_query(
+        name='avg Unit Price by Category & Business Type',
+        metrics=['avg Unit Price'],
+        dimensions=['Category', 'Business Type'],
+        drop_null_dimensions=True
+    )
+
+    cube.define_query(
+        name='High-Margin Products (>35%)',
+        metrics=['number of Orders'],
+        computed_metrics=['Margin'],
+        dimensions=['Product'],
+        having='[Margin %] >= 35',
+        drop_null_dimensions=True,
+        sort=[('Margin', 'desc')]
+    )
@@ -0,0 +1,99 @@
+import copy
+import threading
+
+
+def snapshot(cube):
+    """Shallow copy of a cube frozen at its current filters and definitions
+
+    Tables, link tables and context state frames are shared; filters and query
+    definitions are the copy's own. Filtering replaces context state frames rather
+    than changing them, so the copy can be filtered, or queried from another
+    thread, without touching the original (the app's sessions are such copies).
+    """
+    view = copy.copy(cube)
+    view.context_states = dict(cube.context_states)
+    view.applied_filters = {state: list(filters) for state, filters in cube.applied_filters.items()}
+    view.filter_pointer = dict(cube.filter_pointer)
+    view.metrics = dict(cube.metrics)
+    view.computed_metrics = dict(cube.computed_metrics)
+    view.queries = dict(cube.queries)
+    view._queries_missing_by_name = {n: set(q) for n, q in getattr(cube, '_queries_missing_by_name', {}).items()}
+    return view
+
+
+class QueryPrefetcher:
+    """Computes a cube's queries for its current filters in the background
+
+    schedule() submits every query whose result isn't cached yet to a (shared)
+    executor, working on a snapshot of the cube; results go into the QueryCache.
+    Scheduling again under different filters cancels the queued work of the
+    previous filters, and queries of theirs already running are not stored.
+    result() returns a query's cached result, waits for it if it is being
+    computed, or computes it itself. scope is passed on to QueryCache.key().
+    """
+
+    def __init__(self, cache, executor, scope=None):
+        self.cache = cache
+        self.executor = executor
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._keys = None        # cache keys of the queries last scheduled
+        self._futures = {}       # cache key -> future computing it
+
+    def schedule(self, cube, query_names):
+        """Prefetch the queries for the cube's current state (nothing to do if that state is already scheduled)"""
+        keys = {name: self.cache.key(cube, name, self.scope) for name in query_names}
+        with self._lock:
+            if keys == self._keys:
+                return
+            self._cancel()
+            self._keys = keys
+            frozen = snapshot(cube)
+            for name, key in keys.items():
+                if key not in self.cache:
+                    self._futures[key] = self.executor.submit(self._run, self._generation, frozen, name, key)
+
+    def _run(self, generation, cube, query_name, key):
+        if generation != self._generation:
+            return None
+        result = cube.query(query_name)
+        # Filters changed while this ran; its result isn't wanted anymore
+        if generation == self._generation:
+            self.cache.put(key, query_name, result)
+        return result
+
+    def _cancel(self):
+        self._generation += 1
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+
+    def cancel(self):
+        """Drop the queued prefetches"""
+        with self._lock:
+            self._cancel()
+            self._keys = None
+
+    def pending(self):
+        """Number of scheduled queries not computed yet"""
+        with self._lock:
+            return sum(not future.done() for future in self._futures.values())
+
+    def result(self, cube, query_name):
+        """The query's result on the cube in its current state"""
+        key = self.cache.key(cube, query_name, self.scope)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        with self._lock:
+            future = self._futures.get(key)
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception:
+                # Cancelled, or failed: computed here instead, so any error is raised in the caller
+                result = None
+            if result is not None:
+                return result.copy()
+        return self.cache.query(cube, query_name, self.scope)
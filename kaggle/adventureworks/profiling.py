@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+import pandas as pd
+
+try:
+    import psutil
+    _process = psutil.Process()
+except ImportError:
+    psutil = None
+
+# The recorder of the rerun running on this thread (Streamlit runs each session's script on its own thread)
+_active = threading.local()
+
+logger = logging.getLogger('adventureworks.profiling')
+
+
+def _rss_mb():
+    """Current resident set size, or the peak where psutil isn't installed"""
+    if psutil is not None:
+        return _process.memory_info().rss / 2**20
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def row_count(obj):
+    """Rows of a frame or series, summed over a dict of them; None for anything else"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict) and obj and all(isinstance(v, (pd.DataFrame, pd.Series)) for v in obj.values()):
+        return sum(len(v) for v in obj.values())
+    return None
+
+
+class StageRecorder:
+    """Wall time, rows in/out and memory delta of each stage of a rerun
+
+    Call start_rerun() at the top of the script and finish_rerun() at the end;
+    stages timed in between (with stage() or @profiled) land in `records`, and
+    finished reruns are kept in a bounded history (and in the rolling log, if
+    one is configured with configure_log()).
+    """
+
+    def __init__(self, history=50):
+        self.history = deque(maxlen=history)   # one list of records per finished rerun
+        self.records = []
+        self.rerun = 0
+        self._open = []                         # names of the stages being timed, outermost first
+
+    def start_rerun(self):
+        self.rerun += 1
+        self.records = []
+        self._open = []
+        _active.recorder = self
+
+    def finish_rerun(self):
+        if getattr(_active, 'recorder', None) is self:
+            _active.recorder = None
+        self.history.append(self.records)
+        for record in self.records:
+            logger.info(json.dumps(record, default=str))
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Time the block; set record['rows_out'] (or 'rows_in') inside it when only known there
+
+        A stage timed inside another names it as its parent, and its time is part of the parent's.
+        """
+        record = {'rerun': self.rerun, 'stage': name, 'parent': self._open[-1] if self._open else None,
+                  'rows_in': rows_in, 'rows_out': None,
+                  'started': datetime.now(timezone.utc).isoformat(timespec='milliseconds')}
+        rss_before = _rss_mb()
+        self._open.append(name)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._open.pop()
+            record['wall_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            rss_after = _rss_mb()
+            record['rss_mb'] = None if rss_after is None else round(rss_after, 1)
+            record['rss_delta_mb'] = None if rss_before is None else round(rss_after - rss_before, 1)
+            self.records.append(record)
+
+    def frame(self, records=None):
+        """Records of the current rerun (or the given ones) as a DataFrame"""
+        columns = ['rerun', 'stage', 'parent', 'wall_ms', 'rows_in', 'rows_out', 'rss_delta_mb', 'rss_mb', 'started']
+        return pd.DataFrame(self.records if records is None else records, columns=columns)
+
+    def history_frame(self):
+        """Every record of the finished reruns kept in the history"""
+        return self.frame([record for records in self.history for record in records])
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """StageRecorder.stage() on the active recorder; times nothing when there is none"""
+    recorder = getattr(_active, 'recorder', None)
+    if recorder is None:
+        yield {}
+        return
+    with recorder.stage(name, rows_in) as record:
+        yield record
+
+
+def profiled(name, rows_in=None):
+    """Decorator timing each call as a stage; rows_out is counted from the return value
+
+    rows_in: optional function of the call's arguments giving the rows going in
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name, rows_in(*args, **kwargs) if rows_in else None) as record:
+                result = fn(*args, **kwargs)
+                record['rows_out'] = row_count(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def configure_log(path, max_bytes=5 * 2**20, backups=3):
+    """Append every stage record as a JSON line to `path`, rolling over past max_bytes"""
+    path = os.path.abspath(path)
+    if any(getattr(h, 'baseFilename', None) == path for h in logger.handlers):
+        return
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
@@ -0,0 +1,168 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+
+def _canonical_hash(obj):
+    """Stable digest of a JSON-like structure (dict keys sorted, anything else by repr)"""
+    payload = json.dumps(obj, sort_keys=True, default=repr)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _aggregation_id(aggregation):
+    # Functions have no stable text form; the same function object gives the same id
+    if callable(aggregation):
+        return f'{getattr(aggregation, "__module__", "")}.{getattr(aggregation, "__qualname__", repr(aggregation))}@{id(aggregation):x}'
+    return aggregation
+
+
+def _canonical_filters(filters):
+    """Filter criteria with the values of each dimension in a fixed order (selection order doesn't change results)"""
+    return {dim: sorted(values, key=repr) for dim, values in (filters or {}).items()}
+
+
+def query_definition(cube, query_name):
+    """Everything a query's result depends on apart from the data and the filters:
+    the query itself plus every metric and computed metric it evaluates"""
+    query = cube.queries[query_name]
+    metric_names = list(query['metrics']) + list(query.get('hidden_metrics', []))
+    computed_names = query.get('computed_metrics_ordered') or list(query['computed_metrics'])
+    metrics = {}
+    for name in metric_names:
+        metric = cube.metrics[name]
+        metrics[name] = {
+            'expression': metric.expression,
+            'row_condition_expression': metric.row_condition_expression,
+            'aggregation': _aggregation_id(metric.aggregation),
+            'metric_filters': _canonical_filters(metric.metric_filters),
+            'context_state_name': metric.context_state_name,
+            'ignore_dimensions': metric.ignore_dimensions,
+            'fillna': metric.fillna,
+        }
+    computed = {name: {'expression': cube.computed_metrics[name].expression,
+                       'fillna': cube.computed_metrics[name].fillna} for name in computed_names}
+    return {
+        'dimensions': list(query['dimensions']),
+        'metrics': list(query['metrics']),
+        'computed_metrics': list(query['computed_metrics']),
+        'having': query.get('having'),
+        'sort': [list(s) for s in query.get('sort') or []],
+        'drop_null_dimensions': query.get('drop_null_dimensions'),
+        'drop_null_metric_results': query.get('drop_null_metric_results'),
+        'metric_definitions': metrics,
+        'computed_metric_definitions': computed,
+    }
+
+
+def context_filters(cube, definition):
+    """Current filters of every context state the query's metrics read from"""
+    states = {m['context_state_name'] for m in definition['metric_definitions'].values()}
+    return {state: _canonical_filters(cube.get_filters(0, context_state_name=state))
+            for state in sorted(states) if state != 'Unfiltered'}
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results
+
+    Entries are keyed by a hash of the query definition (including the
+    metrics it uses), the filters of the context states it reads and the
+    cube's data, so results can be shared by every session on the same
+    cube. Redefining a query or one of its metrics drops the entries of its
+    old definition once no scope (e.g. a session, see key()) still uses it.
+    Evicts least recently used entries past max_entries or max_bytes.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()    # key -> (query name, DataFrame, bytes)
+        self._definitions = {}           # (scope, query name) -> hash of its current definition
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def key(self, cube, query_name, scope=None):
+        """The cache key of a query on the cube in its current filter state
+
+        scope names who defines the query (like a session with its own ad hoc query),
+        so that redefining it there leaves the entries other scopes still use.
+        """
+        key, definition_hash = self._key(cube, query_name)
+        with self._lock:
+            previous = self._definitions.get((scope, query_name))
+            if previous != definition_hash:
+                self._definitions[(scope, query_name)] = definition_hash
+                if previous is not None and previous not in self._definitions.values():
+                    self._drop_definition(previous)
+        return key
+
+    def _key(self, cube, query_name):
+        definition = query_definition(cube, query_name)
+        definition_hash = _canonical_hash(definition)
+        # Views of one shared cube share its tables; a rebuilt cube gets a new key space.
+        # The definition hash leads the key, so the entries of a definition can be found.
+        state = _canonical_hash([id(cube.tables), context_filters(cube, definition)])
+        return f'{definition_hash}:{state}', definition_hash
+
+    def get(self, key):
+        """A copy of the result stored under a key from key(), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].copy()
+
+    def query(self, cube, query_name, scope=None):
+        """cube.query(query_name), served from the cache when the same query ran under the same filters"""
+        key = self.key(cube, query_name, scope)
+        result = self.get(key)
+        if result is not None:
+            return result
+        result = cube.query(query_name)
+        self.put(key, query_name, result)
+        return result.copy()
+
+    def put(self, key, query_name, result):
+        """Store a result under a key from key()"""
+        size = int(result.memory_usage(index=True, deep=True).sum()) if isinstance(result, pd.DataFrame) else 0
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (query_name, result, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, query_name=None):
+        """Forget the results of one query, or of all of them"""
+        with self._lock:
+            if query_name is None:
+                self._entries.clear()
+                self._definitions.clear()
+                self._bytes = 0
+            else:
+                for key in [k for k, entry in self._entries.items() if entry[0] == query_name]:
+                    self._bytes -= self._entries.pop(key)[2]
+                for scoped in [scoped for scoped in self._definitions if scoped[1] == query_name]:
+                    del self._definitions[scoped]
+
+    def _drop_definition(self, definition_hash):
+        prefix = f'{definition_hash}:'
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            self._bytes -= self._entries.pop(key)[2]
+
+    def info(self):
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,34 @@
+def top_n(df, metric, n, ascending=False):
+    """The n rows with the largest (or smallest) values of a metric, missing values last"""
+    return df.sort_values(metric, ascending=ascending, na_position='last', kind='stable').head(n)
+
+
+def page(df, number, size):
+    """Rows of the 1-based page `number` of `size` rows, and the number of pages"""
+    pages = max(1, -(-len(df) // size))
+    number = min(max(1, number), pages)
+    return df.iloc[(number - 1) * size:number * size], pages
+
+
+def cap_categories(df, dims, measure, max_categories=20, other='Other', aggregation='sum'):
+    """The measure by dims, with each dimension limited to max_categories members
+
+    The max_categories - 1 members with the largest total magnitude of the measure are kept;
+    the rest are folded into `other` and their rows combined with `aggregation`.
+    Frames already within the limit come back unchanged (only dims and measure).
+    """
+    capped = df[dims + [measure]]
+    folded = False
+    for dim in dims:
+        totals = capped[measure].abs().groupby(capped[dim], dropna=False, observed=True).sum()
+        if len(totals) <= max_categories:
+            continue
+        keep = totals.nlargest(max_categories - 1).index
+        if not folded:
+            capped = capped.copy()
+            folded = True
+        column = capped[dim]
+        capped[dim] = column.astype(object).where(column.isin(keep), other)
+    if not folded:
+        return capped
+    return capped.groupby(dims, sort=False, dropna=False)[measure].agg(aggregation).reset_index()
@@ -0,0 +1,266 @@
+import os
+import io
+import json
+import time
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Get the current directory of the script
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# The CSV exports shipped with the repo
+source_dir = os.path.join(current_dir, 'Source')
+
+# Extra folder with the exports (e.g. a full Sales.csv), searched before Source/
+configured_dir = os.environ.get('ADVENTUREWORKS_SOURCE_DIR')
+
+# Typed snapshots of every table read, so later starts skip CSV parsing and the network
+cache_dir = os.environ.get('ADVENTUREWORKS_CACHE_DIR', os.path.join(current_dir, '.cache'))
+
+# Set ADVENTUREWORKS_OFFLINE=1 to never reach the network (air-gapped deployments)
+offline = os.environ.get('ADVENTUREWORKS_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+REMOTE_URL = 'https://raw.githubusercontent.com/cube-alchemy/cube-alchemy-examples/main/kaggle/adventureworks/Source/{table}.csv'
+
+# Tables used by the Streamlit app
+TABLES = ['Product', 'Region', 'Reseller', 'Sales', 'Salesperson']
+
+# Columns exported as currency text ("$1,234.56")
+CURRENCY_COLUMNS = ['Unit Price', 'Cost', 'Target']
+
+# Columns exported as long-form dates ("Friday, December 1, 2017") and their format
+DATE_COLUMNS = {'OrderDate': '%A, %B %d, %Y', 'TargetMonth': '%A, %B %d, %Y'}
+
+
+class LocalSource:
+    """Tab separated exports in a local folder"""
+
+    is_local = True
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __repr__(self):
+        return f'LocalSource({self.directory!r})'
+
+    def locate(self, table):
+        path = os.path.join(self.directory, f'{table}.csv')
+        return path if os.path.isfile(path) else None
+
+    def fingerprint(self, table):
+        """Changes whenever the file is rewritten, so stale snapshots are re-read"""
+        stat = os.stat(self.locate(table))
+        return f'{self.locate(table)}:{stat.st_mtime_ns}:{stat.st_size}'
+
+    def read(self, table):
+        return pd.read_csv(self.locate(table), sep='\t')
+
+
+class RemoteSource:
+    """Exports served over HTTP; only fetched when no local file or snapshot has the table"""
+
+    is_local = False
+
+    def __init__(self, url=REMOTE_URL, timeout=30):
+        self.url = url
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f'RemoteSource({self.url!r})'
+
+    def locate(self, table):
+        return self.url.format(table=table)
+
+    def fingerprint(self, table):
+        return self.locate(table)
+
+    def read(self, table):
+        with urllib.request.urlopen(self.locate(table), timeout=self.timeout) as response:
+            return pd.read_csv(io.BytesIO(response.read()), sep='\t')
+
+
+def default_sources():
+    """Configured folder, then the repo's Source/ folder, then GitHub (unless offline)"""
+    sources = [LocalSource(configured_dir)] if configured_dir else []
+    sources.append(LocalSource(source_dir))
+    if not offline:
+        sources.append(RemoteSource())
+    return sources
+
+
+def _parse_distinct(values, parse, missing):
+    """Parse each distinct value once and broadcast back; exports repeat the same prices and dates many times"""
+    codes, uniques = pd.factorize(values)
+    # Missing values get code -1, which picks the appended missing marker
+    parsed = np.append(parse(pd.Series(uniques, dtype=object)).to_numpy(), missing)
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
+
+
+def parse_currency(values):
+    """Currency text ("$1,234.56") to float64"""
+    if not pd.api.types.is_object_dtype(values):
+        return values.astype('float64')
+    return _parse_distinct(values, lambda u: pd.to_numeric(u.str.replace(r'[$,]', '', regex=True)).astype('float64'), np.nan)
+
+
+def parse_dates(values, date_format):
+    """Date text in a known format to datetime64"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return _parse_distinct(values, lambda u: pd.to_datetime(u, format=date_format), np.datetime64('NaT', 'ns'))
+
+
+def normalize(df):
+    """Turn the raw export columns into float64 and datetime64, in place"""
+    for column in CURRENCY_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_currency(df[column])
+    for column, date_format in DATE_COLUMNS.items():
+        if column in df.columns:
+            df[column] = parse_dates(df[column], date_format)
+    return df
+
+
+# Recorded with each snapshot, so a change to the normalization invalidates them
+NORMALIZATION = repr((CURRENCY_COLUMNS, DATE_COLUMNS))
+
+
+def _snapshot_paths(table, directory):
+    return os.path.join(directory, f'{table}.parquet'), os.path.join(directory, f'{table}.json')
+
+
+def _read_snapshot(table, directory, fingerprint=None):
+    """The snapshot of a table, or None if there is none or (given a fingerprint) it is stale"""
+    snapshot_file, manifest_file = _snapshot_paths(table, directory)
+    if not (os.path.exists(snapshot_file) and os.path.exists(manifest_file)):
+        return None
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    if manifest.get('normalization') != NORMALIZATION:
+        return None
+    if fingerprint is not None and manifest.get('fingerprint') != fingerprint:
+        return None
+    try:
+        return pd.read_parquet(snapshot_file)
+    except ImportError:
+        return None
+
+
+def _write_snapshot(table, directory, df, source, fingerprint):
+    snapshot_file, manifest_file = _snapshot_paths(table, directory)
+    os.makedirs(directory, exist_ok=True)
+    # Written under temporary names and moved in place, so concurrent loads never read half a file
+    suffix = f'.{os.getpid()}.tmp'
+    df.to_parquet(snapshot_file + suffix, index=False)
+    with open(manifest_file + suffix, 'w') as f:
+        json.dump({'source': repr(source), 'fingerprint': fingerprint, 'normalization': NORMALIZATION}, f, indent=2)
+    os.replace(snapshot_file + suffix, snapshot_file)
+    os.replace(manifest_file + suffix, manifest_file)
+
+
+def _ingest(table, source):
+    start = time.perf_counter()
+    return normalize(source.read(table)), time.perf_counter() - start
+
+
+def load_tables(tables=TABLES, sources=None, snapshot_dir=cache_dir, max_workers=None, verbose=False):
+    """Load the tables offline-first, returning {name: DataFrame}
+
+    For each table the first local source that has it wins, reusing its
+    snapshot while the file is unchanged. A table no local source has is
+    served from its last snapshot, and only a table without either is
+    fetched from a remote source. Everything that has to be read or fetched
+    is done concurrently and snapshotted for the next start.
+    """
+    sources = default_sources() if sources is None else sources
+    loaded, pending = {}, {}
+    for table in tables:
+        local = next((s for s in sources if s.is_local and s.locate(table)), None)
+        if local is not None:
+            df = _read_snapshot(table, snapshot_dir, local.fingerprint(table))
+            if df is None:
+                pending[table] = local
+            else:
+                loaded[table] = df
+            continue
+
+        df = _read_snapshot(table, snapshot_dir)
+        if df is not None:
+            loaded[table] = df
+            continue
+
+        remote = next((s for s in sources if not s.is_local), None)
+        if remote is None:
+            raise FileNotFoundError(
+                f"No local copy or snapshot of '{table}.csv'; put it in {source_dir}, "
+                f"point ADVENTUREWORKS_SOURCE_DIR at a folder containing it, or allow network access"
+            )
+        pending[table] = remote
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max_workers or len(pending)) as executor:
+            futures = {table: executor.submit(_ingest, table, source) for table, source in pending.items()}
+            for table, future in futures.items():
+                source = pending[table]
+                loaded[table], seconds = future.result()
+                try:
+                    _write_snapshot(table, snapshot_dir, loaded[table], source, source.fingerprint(table))
+                except ImportError:
+                    # No Parquet engine installed: keep working without snapshots
+                    pass
+                if verbose:
+                    print(f"{table}: {len(loaded[table]):,} rows from {source} in {seconds * 1000:.0f} ms")
+
+    return {table: loaded[table] for table in tables}
+
+
+def benchmark_normalize(sales, rows=1_000_000, repeat=3):
+    """Time normalize() against per-cell parsing on the Sales table replicated to `rows` rows"""
+    raw = pd.concat([sales] * -(-rows // len(sales)), ignore_index=True).iloc[:rows]
+
+    def per_cell(df):
+        # What the app and the notebook used to do
+        def clean_currency(x):
+            if isinstance(x, str):
+                return float(x.replace('$', '').replace(',', ''))
+            return x
+
+        for column in CURRENCY_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].apply(clean_currency)
+        for column, date_format in DATE_COLUMNS.items():
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format=date_format)
+        return df
+
+    timings = {}
+    for name, step in [('per-cell', per_cell), ('normalize', normalize)]:
+        best = float('inf')
+        for _ in range(repeat):
+            df = raw.copy()
+            start = time.perf_counter()
+            step(df)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        print(f"{name:>10}: {best * 1000:8.0f} ms  ({rows / best / 1e6:.1f}M rows/s)")
+    print(f"{'speedup':>10}: {timings['per-cell'] / timings['normalize']:.1f}x")
+    return timings
+
+
+# Run directly to (re)build the snapshots and see where each table came from
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load the AdventureWorks tables and snapshot them')
+    parser.add_argument('--benchmark', type=int, nargs='?', const=1_000_000, default=None,
+                        help='Benchmark normalize() on the raw Sales export replicated to this many rows')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        sales_source = next(s for s in default_sources() if s.locate('Sales'))
+        benchmark_normalize(sales_source.read('Sales'), args.benchmark)
+    else:
+        start = time.perf_counter()
+        tables = load_tables(verbose=True)
+        print(f"Loaded {len(tables)} tables in {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -1,100 +1,89 @@
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 from typing import List, Dict
 from cube_alchemy import Hypercube
+from sources import load_tables as load_source_tables
+from query_cache import QueryCache
+from dimension_index import DimensionIndex
+from prefetch import QueryPrefetcher, snapshot
+from results import top_n, page, cap_categories
+from model import define_metrics_and_queries
+from profiling import StageRecorder, stage, profiled, row_count, configure_log
 
 # --- Load data (AdventureWorks dummy) ---
-def _clean_currency(x):
-	if isinstance(x, str):
-		return float(x.replace('$', '').replace(',', ''))
-	return x
-
+# Read offline-first: local exports and snapshots, the network only for tables missing from both
+@profiled('load_tables')
 @st.cache_data(show_spinner=False)
 def load_tables():
-	def clean_currency(x):
-		if isinstance(x,str):
-			return float(x.replace('$', '').replace(',', ''))
-		else:
-			return x
-	# Load tables
-	tables = {}
-	for table in ['Product', 'Region', 'Reseller', 'Sales', 'Salesperson']:
-		url = f"https://raw.githubusercontent.com/cube-alchemy/cube-alchemy-examples/main/kaggle/adventureworks/Source/{table}.csv"
-		df = pd.read_csv(url, sep='\t')
-		for columns in ['Unit Price', 'Cost']:
-			if columns in df.columns:
-				df[columns] = df[columns].apply(clean_currency)
-		tables[table] = df
-	return tables
+	return load_source_tables()
 
 # --- Build or reuse Hypercube ---
+# Built once per process and shared by every session; sessions only read it
+@st.cache_resource(show_spinner='Building cube...')
+def build_cube():
+	cube = Hypercube(load_tables())
+	define_metrics_and_queries(cube)
+	return cube
+
+@profiled('get_cube')
 def get_cube():
 	if 'cube' not in st.session_state:
-		st.session_state.cube = Hypercube(load_tables())
-		_define_metrics_and_queries(st.session_state.cube)
+		# The session's own filters and definitions over the shared (never filtered) cube's tables and states
+		st.session_state.cube = snapshot(build_cube())
 	return st.session_state.cube
 
-def _define_metrics_and_queries(cube: Hypercube):
+# Query results shared by all sessions, keyed by query definition and filters
+@st.cache_resource
+def get_query_cache():
+	return QueryCache()
 
-	def count_distinct(x):
-		return x.nunique()
-	
-	# Base metrics
-	cube.define_metric(name='Revenue', expression='[Unit Price] * [Quantity]', aggregation='sum')
-	cube.define_metric(name='Unfiltered Revenue', expression='[Unit Price] * [Quantity]', aggregation='sum', context_state_name='Unfiltered')
-	cube.define_metric(name='Cost',    expression='[Cost]',                 aggregation='sum')
-	cube.define_metric(name='avg Unit Price', expression='[Unit Price]',    aggregation='mean')
-	cube.define_metric(name='number of Orders', expression='[SalesOrderNumber]', aggregation=count_distinct)
-
-	# Or..
-	import copy
-	cube.metrics['Total Revenue'] = copy.deepcopy(cube.metrics['Revenue'])
-	cube.metrics['Total Revenue'].name = 'Total Revenue'
-	cube.metrics['Total Revenue'].ignore_dimensions = True
-
-	# Computed metrics (post-aggregation)
-	cube.define_computed_metric(name='Margin', expression='[Revenue] - [Cost]')
-	cube.define_computed_metric(name='Margin %', expression='100 * ([Revenue] - [Cost]) / [Revenue]')
-	cube.define_computed_metric(name='Revenue over Total', expression='[Revenue] / [Total Revenue]')
-
-	# Queries
-	cube.define_query(
-		name='Sales by Region and Category',
-		metrics=['Revenue'],
-		computed_metrics=['Revenue over Total','Margin %'],
-		dimensions=['Region', 'Category'],
-		drop_null_dimensions=True,
-		sort=[('Revenue', 'desc')]
-	)
-
-	cube.define_query(
-		name='avg Unit Price by Category & Business Type',
-		metrics=['avg Unit Price'],
-		dimensions=['Category', 'Business Type'],
-		drop_null_dimensions=True
-	)
-
-	cube.define_query(
-		name='High-Margin Products (>35%)',
-		metrics=['number of Orders'],
-		computed_metrics=['Margin'],
-		dimensions=['Product'],
-		having='[Margin %] >= 35',
-		drop_null_dimensions=True,
-		sort=[('Margin', 'desc')]
-	)
+# Background workers computing every session's defined queries ahead of the tab asking for them
+@st.cache_resource
+def get_prefetch_executor():
+	return ThreadPoolExecutor(max_workers=2, thread_name_prefix='query-prefetch')
+
+def get_prefetcher() -> QueryPrefetcher:
+	if 'prefetcher' not in st.session_state:
+		# Each session is its own scope, so its ad hoc query doesn't evict other sessions' results
+		st.session_state.prefetcher = QueryPrefetcher(get_query_cache(), get_prefetch_executor(), scope=uuid.uuid4().hex)
+	return st.session_state.prefetcher
+
+# Sorted distinct members of every dimension, for the filter options
+@st.cache_resource(show_spinner=False)
+def get_dimension_index():
+	return DimensionIndex(build_cube())
 
 # --- UI helpers ---
+@profiled('apply_filters', rows_in=lambda cube, criteria: len(cube.context_states['Default']))
 def apply_filters(cube: Hypercube, criteria: Dict[str, List[str]]):
-	cube.reset_filters('all')
-	if criteria:
-		cube.filter(criteria)
+	# Only apply what changed since the last rerun: a tighter selection narrows the current
+	# state, and only removed or widened dimensions need a rebuild from the unfiltered state
+	current = cube.get_filters()
+	changed = {dim: values for dim, values in criteria.items() if set(values) != set(current.get(dim, []))}
+	removed = [dim for dim in current if dim not in criteria]
+	widened = [dim for dim in changed if dim in current and not set(changed[dim]) <= set(current[dim])]
+	if removed or widened:
+		cube.remove_filter(removed + widened)
+	if changed:
+		cube.filter(changed)
+	return cube.context_states['Default']
+
+# Charts show at most this many members per dimension; the rest are combined into 'Other'
+MAX_CHART_CATEGORIES = 25
+PAGE_SIZES = [50, 100, 500, 1000]
 
-def bar_chart(df: pd.DataFrame, dims: List[str], measure: str, title: str):
+@profiled('bar_chart', rows_in=lambda df, *args, **kwargs: row_count(df))
+def bar_chart(df: pd.DataFrame, dims: List[str], measure: str, title: str, aggregation: str = 'sum'):
 	if df is None or df.empty:
 		st.info('No data to plot.')
 		return
+	if len(dims) in (1, 2):
+		df = cap_categories(df, dims, measure, MAX_CHART_CATEGORIES, aggregation=aggregation)
 	if len(dims) == 2:
 		piv = df.pivot_table(index=dims[0], columns=dims[1], values=measure, fill_value=0)
 		st.bar_chart(piv, height=360, stack=False)
@@ -104,35 +93,107 @@ def bar_chart(df: pd.DataFrame, dims: List[str], measure: str, title: str):
 	else:
 		st.write("max 2 dimensions")
 
+def additive(cube: Hypercube, measure: str) -> bool:
+	# Sums and counts add up across members, and so do computed metrics that only add or subtract them (like Margin)
+	metric = cube.metrics.get(measure)
+	if metric is not None:
+		return metric.aggregation in ('sum', 'count')
+	computed = cube.computed_metrics.get(measure)
+	if computed is None or not re.fullmatch(r'[\s+\-()]*', re.sub(r'\[[^\]]*\]', '', computed.expression)):
+		return False
+	return all(additive(cube, column) for column in computed.columns)
+
+def other_aggregation(cube: Hypercube, measure: str) -> str:
+	# Additive metrics are summed over the folded members; anything else (averages, ratios) is averaged
+	return 'sum' if additive(cube, measure) else 'mean'
+
+def result_table(df: pd.DataFrame, metrics: List[str], key: str):
+	# Ranking and paging happen here, so only one page of rows is sent to the browser
+	rank_col, n_col, size_col, page_col = st.columns(4)
+	rank_by = rank_col.selectbox('Top N by', options=['(all rows)'] + metrics, key=f'{key}_rank_by')
+	if rank_by != '(all rows)':
+		n = n_col.number_input('N', min_value=1, value=20, step=10, key=f'{key}_top_n')
+		df = top_n(df, rank_by, int(n))
+	size = size_col.selectbox('Rows per page', options=PAGE_SIZES, index=1, key=f'{key}_page_size')
+	number = page_col.number_input('Page', min_value=1, value=1, key=f'{key}_page')
+	rows, pages = page(df, int(number), size)
+	current = min(int(number), pages)
+	first = (current - 1) * size
+	st.dataframe(rows, use_container_width=True)
+	st.caption(f'Rows {first + min(1, len(rows)):,}-{first + len(rows):,} of {len(df):,} (page {current} of {pages})')
+
+def run_query(cube: Hypercube, name: str) -> pd.DataFrame:
+	with stage('cube.query', rows_in=len(cube.context_states['Default'])) as record:
+		result = get_prefetcher().result(cube, name)
+		record['rows_out'] = len(result)
+	return result
+
+# --- Diagnostics ---
+# Set ADVENTUREWORKS_DIAGNOSTICS_LOG to a file path to keep every rerun's stage timings as rolling JSON lines
+DIAGNOSTICS_LOG = os.environ.get('ADVENTUREWORKS_DIAGNOSTICS_LOG')
+
+@st.cache_resource
+def diagnostics_log():
+	if DIAGNOSTICS_LOG:
+		configure_log(DIAGNOSTICS_LOG)
+	return DIAGNOSTICS_LOG
+
+def get_recorder() -> StageRecorder:
+	if 'recorder' not in st.session_state:
+		st.session_state.recorder = StageRecorder()
+	return st.session_state.recorder
+
 
 # --- App ---
 st.set_page_config(page_title='Cube Alchemy • AdventureWorks', layout='wide')
 st.sidebar.title('AdventureWorks Explorer')
 #st.caption('Minimal Streamlit app powered by cube_alchemy Hypercube')
 
+diagnostics_log()
+recorder = get_recorder()
+recorder.start_rerun()
+
 cube = get_cube()
-def _ensure_schema_fig(cube: Hypercube):
-	if 'schema_fig' not in st.session_state:
-		try:
-			cube.visualize_graph(full_column_names=False)
-			st.session_state['schema_fig'] = plt.gcf()
-		except Exception as e:
-			st.session_state['schema_fig'] = None
-			st.warning(f'Unable to render schema graph: {e}')
-_ensure_schema_fig(cube)
+
+# The schema graph is the same for every session, so it is drawn once
+@st.cache_resource(show_spinner=False)
+def schema_figure():
+	try:
+		build_cube().visualize_graph(full_column_names=False)
+		return plt.gcf(), None
+	except Exception as e:
+		return None, e
+
+schema_fig, schema_error = schema_figure()
+if schema_error is not None:
+	st.warning(f'Unable to render schema graph: {schema_error}')
 
 ## Sidebar filters (choose dimensions, then values; options from Unfiltered state)
 st.sidebar.header('Filters')
 all_dims = cube.get_dimensions()
 selected_dims = st.sidebar.multiselect('Filter dimensions', options=all_dims, key='filter_dims')
 
+# Dimensions with more members than this are searched and paged instead of listed in full
+MAX_FILTER_OPTIONS = 1000
+
+dimension_index = get_dimension_index()
 criteria: Dict[str, List[str]] = {}
 for dim in selected_dims:
-	try:
-		vals = cube.dimensions([dim], context_state_name='Unfiltered')[dim]
-		options = vals.dropna().sort_values().unique().tolist()
-	except Exception:
+	if dim not in dimension_index:
 		options = []
+	elif dimension_index.count(dim) <= MAX_FILTER_OPTIONS:
+		options = dimension_index.values(dim)
+	else:
+		search = st.sidebar.text_input(f'Search {dim}', key=f'search_{dim}')
+		first_page, matches = dimension_index.search(dim, search, limit=MAX_FILTER_OPTIONS)
+		option_page = 1
+		if matches > MAX_FILTER_OPTIONS:
+			pages = -(-matches // MAX_FILTER_OPTIONS)
+			option_page = st.sidebar.number_input(f'{dim} page (of {pages})', min_value=1, max_value=pages, value=1, key=f'page_{dim}')
+		options = first_page if option_page == 1 else dimension_index.search(dim, search, offset=(option_page - 1) * MAX_FILTER_OPTIONS, limit=MAX_FILTER_OPTIONS)[0]
+		st.sidebar.caption(f'{matches:,} of {dimension_index.count(dim):,} members match')
+		# Keep what is already picked selectable while browsing other pages
+		options = list(dict.fromkeys(st.session_state.get(f'flt_{dim}', []) + options))
 	picked = st.sidebar.multiselect(dim, options=options, key=f'flt_{dim}')
 	if picked:
 		criteria[dim] = picked
@@ -140,13 +201,16 @@ for dim in selected_dims:
 # Apply filters on every change to mirror the exact UI state
 apply_filters(cube, criteria)
 
+# With the filters settled, compute the defined queries in the background (the ad hoc one changes as it is edited)
+get_prefetcher().schedule(cube, [name for name in cube.queries if not name.startswith('(temp)')])
+
 # Top navigation tabs
-tab_schema, tab_on_the_fly, tab_defs, tab_visuals = st.tabs(["Schema", "On the fly Table", "Definitions", "Defined Queries Visuals"])
+tab_schema, tab_on_the_fly, tab_defs, tab_visuals, tab_diagnostics = st.tabs(["Schema", "On the fly Table", "Definitions", "Defined Queries Visuals", "Diagnostics"])
 
 with tab_schema:
 	st.subheader('Tables and relationships')
-	if st.session_state.get('schema_fig') is not None:
-		st.pyplot(st.session_state['schema_fig'])
+	if schema_fig is not None:
+		st.pyplot(schema_fig)
 	else:
 		st.info('Schema graph not available.')
 
@@ -163,7 +227,7 @@ with tab_on_the_fly:
 			computed_metrics=ad_hoc_computed_metrics,
 			#drop_null_dimensions=True
 		)
-		st.write(cube.query("(temp) Ad Hoc Query"))
+		result_table(run_query(cube, "(temp) Ad Hoc Query"), ad_hoc_metrics + ad_hoc_computed_metrics, key='ad_hoc')
 
 with tab_defs:
 
@@ -207,14 +271,33 @@ with tab_visuals:
 	q_def = cube.get_query(q)
 
 	# Results
-	res = cube.query(q)
+	res = run_query(cube, q)
 
 	# Charts for each metric in the selected query
 	st.subheader('Charts (only showing bar chart and underlying table for this example)')
 	dims = q_def['dimensions']
 	for m in q_def['metrics'] + q_def['computed_metrics']:
 		st.markdown(f'**{m}**')
-		bar_chart(res, dims, m, q)
+		bar_chart(res, dims, m, q, aggregation=other_aggregation(cube, m))
 
 	st.subheader('Result table')
-	st.dataframe(res, use_container_width=True)
+	result_table(res, q_def['metrics'] + q_def['computed_metrics'], key='visuals')
+
+# Filled last, so it covers every stage of this rerun
+with tab_diagnostics:
+	st.subheader('This rerun')
+	current = recorder.frame()
+	st.dataframe(current, use_container_width=True, hide_index=True)
+	st.caption(f"Rerun {recorder.rerun}: {current.loc[current['parent'].isna(), 'wall_ms'].sum():,.1f} ms in timed stages")
+
+	previous = recorder.history_frame()
+	if not previous.empty:
+		st.subheader('Previous reruns')
+		st.bar_chart(previous[previous['parent'].isna()].pivot_table(index='rerun', columns='stage', values='wall_ms', aggfunc='sum', fill_value=0), height=300)
+		st.dataframe(previous.groupby('stage')['wall_ms'].describe(percentiles=[0.5, 0.95]), use_container_width=True)
+		st.download_button('Download stage log (JSON lines)', previous.to_json(orient='records', lines=True),
+			file_name='adventureworks_stages.jsonl', mime='application/json')
+	if DIAGNOSTICS_LOG:
+		st.caption(f'Stage records are also appended to {DIAGNOSTICS_LOG}')
+
+recorder.finish_rerun()
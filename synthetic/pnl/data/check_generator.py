@@ -0,0 +1,124 @@
+"""Regression checks for synthetic_generator.py
+
+    python check_generator.py
+
+1. reconcile_net_revenue() against the original row-by-row (iterrows) Net Revenue
+   step, for both transaction engines and a few seeds: same rows and the random
+   stream left in the same state.
+2. The loop engine with seed 42 regenerates the CSVs shipped in this folder byte for byte.
+
+Exits with status 1 if any check fails.
+"""
+import os
+import sys
+import copy
+import filecmp
+import tempfile
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import synthetic_generator as generator
+
+SEEDS = [1, 7, 42]
+SHIPPED_FILES = ['actuals.csv', 'budget.csv', 'calendar_dim.csv']
+SHIPPED_PERIOD = ('2023-01-01', '2023-12-31')
+
+
+def reconcile_net_revenue_reference(actuals_df, accounts_df, rng):
+    """The Net Revenue step as it was written originally, one group at a time"""
+    account_mapping = dict(zip(accounts_df['account_number'], accounts_df['pnl_account_name']))
+    gross_rev_account_nums = [acc_num for acc_num, acc_name in account_mapping.items() if acc_name == 'Gross Revenue']
+    sales_returns_account_nums = [acc_num for acc_num, acc_name in account_mapping.items() if acc_name == 'Sales Returns']
+    net_rev_account_nums = [acc_num for acc_num, acc_name in account_mapping.items() if acc_name == 'Net Revenue']
+
+    gross_rev = actuals_df[actuals_df['account_number'].isin(gross_rev_account_nums)].copy()
+    sales_returns = actuals_df[actuals_df['account_number'].isin(sales_returns_account_nums)].copy()
+
+    groupby_cols = ['date', 'bu_id', 'location_id', 'segment']
+    gross_rev_grouped = gross_rev.groupby(groupby_cols, observed=True)['amount'].sum().reset_index()
+    sales_returns_grouped = sales_returns.groupby(groupby_cols, observed=True)['amount'].sum().reset_index()
+
+    net_revenue_df = pd.merge(gross_rev_grouped, sales_returns_grouped, on=groupby_cols, how='outer', suffixes=('_gross', '_returns'))
+    net_revenue_df[['amount_gross', 'amount_returns']] = net_revenue_df[['amount_gross', 'amount_returns']].fillna(0)
+    net_revenue_df['amount'] = net_revenue_df['amount_gross'] + net_revenue_df['amount_returns']
+    net_revenue_df = net_revenue_df[groupby_cols + ['amount']].copy()
+
+    net_revenue_data = []
+    for _, row in net_revenue_df.iterrows():
+        net_rev_transaction = {
+            'date': row['date'],
+            'account_number': rng.choice(net_rev_account_nums),
+            'location_id': row['location_id'],
+            'bu_id': row['bu_id'],
+            'segment': row['segment'],
+            'amount': row['amount']
+        }
+
+        matching_gross = gross_rev[
+            (gross_rev['date'] == row['date']) &
+            (gross_rev['bu_id'] == row['bu_id']) &
+            (gross_rev['location_id'] == row['location_id']) &
+            (gross_rev['segment'] == row['segment'])
+        ]
+
+        if not matching_gross.empty:
+            for key in generator.OPTIONAL_KEYS:
+                if key in matching_gross.iloc[0] and pd.notna(matching_gross.iloc[0][key]):
+                    net_rev_transaction[key] = matching_gross.iloc[0][key]
+            net_revenue_data.append(net_rev_transaction)
+
+    net_revenue_df = pd.DataFrame(net_revenue_data, columns=actuals_df.columns).astype(actuals_df.dtypes.to_dict())
+    return pd.concat([actuals_df, net_revenue_df], ignore_index=True)
+
+
+def _rng_state(rng):
+    return rng.get_state(legacy=False) if isinstance(rng, np.random.RandomState) else rng.bit_generator.state
+
+
+def check_reconciliation(engine, seed, dims, calendar_df):
+    """reconcile_net_revenue() gives the reference's rows and consumes the same draws"""
+    rng = np.random.RandomState(seed) if engine == 'loop' else np.random.default_rng(seed)
+    actuals_df = generator.TRANSACTION_ENGINES[engine](calendar_df, dims, rng)
+
+    reference_rng = copy.deepcopy(rng)
+    expected = reconcile_net_revenue_reference(actuals_df, dims['accounts'], reference_rng)
+    result = generator.reconcile_net_revenue(actuals_df, dims['accounts'], rng)
+
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+    assert repr(_rng_state(rng)) == repr(_rng_state(reference_rng)), 'random stream left in a different state'
+    return len(result) - len(actuals_df)
+
+
+def check_shipped_csvs(data_dir):
+    """--engine loop with seed 42 writes exactly the shipped CSVs; returns the files that differ"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_synthetic_data(*SHIPPED_PERIOD, engine='loop', seed=42, output_dir=output_dir)
+        return [name for name in SHIPPED_FILES
+                if not filecmp.cmp(os.path.join(data_dir, name), os.path.join(output_dir, name), shallow=False)]
+
+
+if __name__ == '__main__':
+    data_dir = os.path.dirname(os.path.abspath(__file__))
+    dims = generator.load_dimension_tables(data_dir)
+    calendar_df = generator.generate_calendar(*SHIPPED_PERIOD)
+    failures = 0
+
+    for engine in ['loop', 'vectorized']:
+        for seed in SEEDS:
+            try:
+                added = check_reconciliation(engine, seed, dims, calendar_df)
+                print(f"ok    reconcile_net_revenue  engine={engine:<10} seed={seed:<3} {added:,} Net Revenue rows")
+            except AssertionError as e:
+                failures += 1
+                print(f"FAIL  reconcile_net_revenue  engine={engine:<10} seed={seed:<3} {str(e).splitlines()[0]}")
+
+    different = check_shipped_csvs(data_dir)
+    if different:
+        failures += 1
+        print(f"FAIL  --engine loop --seed 42 differs from the shipped {', '.join(different)}")
+    else:
+        print(f"ok    --engine loop --seed 42 reproduces the shipped {', '.join(SHIPPED_FILES)}")
+
+    sys.exit(1 if failures else 0)
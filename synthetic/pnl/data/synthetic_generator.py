@@ -2,12 +2,69 @@ import pandas as pd
 import numpy as np
 import random
 import os
+import glob
+import shutil
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+SEGMENTS = ['Corporate', 'Retail', 'Government']
+
+# Create a range of mean values for each account type
+ACCOUNT_MEAN_VALUES = {
+    'Gross Revenue': (1000, 5000),
+    'Sales Returns': (-300, -50),
+    'Net Revenue': (700, 4700),
+    'Direct Materials': (-1000, -200),
+    'Direct Labor': (-800, -100),
+    'Manufacturing Overhead': (-400, -50),
+    'Marketing': (-500, -100),
+    'Salaries': (-8000, -2000),
+    'Sales Commissions': (-600, -100),
+    'Travel & Entertainment': (-300, -50),
+    'Rent': (-2000, -500),
+    'Utilities': (-500, -100),
+    'Office Supplies': (-200, -50),
+    'R&D': (-5000, -1000),
+    'Depreciation': (-200, -50),
+    'Amortization': (-100, -20),
+    'Interest': (-50, -10),
+    'Taxes': (-500, -100)
+}
+
+# Account rules shared by both transaction engines
+VENDOR_ACCOUNTS = ['Direct Materials', 'Office Supplies', 'Utilities', 'Marketing']
+PROJECT_ACCOUNTS = ['Marketing', 'R&D', 'Travel & Entertainment']
+CORPORATE_ONLY_ACCOUNTS = ['Depreciation', 'Amortization', 'R&D']
+NON_GOVERNMENT_ACCOUNTS = ['Direct Materials', 'Direct Labor', 'Manufacturing Overhead']
+MONTH_END_BOOST_ACCOUNTS = ['Gross Revenue', 'Sales Commissions']
+QUARTER_END_BOOST_ACCOUNTS = ['Marketing', 'Sales Commissions']
+
+OPTIONAL_KEYS = ['cost_center_id', 'vendor_id', 'project_id']
+
+# Dimension tables read by the generator, and the ones only copied along with the output
+DIMENSION_FILES = {
+    'accounts': 'accounts.csv',
+    'location': 'location_dim.csv',
+    'business_unit': 'business_unit_dim.csv',
+    'cost_center': 'cost_center_dim.csv',
+    'vendor': 'vendor_dim.csv',
+    'project': 'project_dim.csv',
+}
+STATIC_FILES = ['pnl_report_mapping.csv']
+
+# Sharded runs write one actuals file per calendar month into this folder
+ACTUALS_PARTS_DIR = 'actuals'
+
+# Output formats for the generated tables (actuals, budget, calendar_dim) and their file extensions
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+ACTUALS_COLUMNS = ['date', 'account_number', 'pnl_account_name', 'location_id', 'bu_id', 'segment',
+                   'amount', 'cost_center_id', 'vendor_id', 'project_id']
 
 def generate_calendar(start_date, end_date):
     """Generate a calendar dimension table with date hierarchies"""
     dates = pd.date_range(start=start_date, end=end_date, freq='D')
-    
+
     calendar_df = pd.DataFrame({
         'date': dates,
         'day': dates.day,
@@ -24,149 +81,143 @@ def generate_calendar(start_date, end_date):
         'is_quarter_end': dates.is_quarter_end,
         'is_year_end': dates.is_year_end
     })
-    
+
     return calendar_df
 
-def generate_synthetic_data(start_date, end_date):
-    """Generate synthetic P&L data with the specified date range"""
-    
-    # Get the directory where the script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Load dimension tables
-    accounts_df = pd.read_csv(os.path.join(script_dir, 'accounts.csv'))
-    location_df = pd.read_csv(os.path.join(script_dir, 'location_dim.csv'))
-    business_unit_df = pd.read_csv(os.path.join(script_dir, 'business_unit_dim.csv'))
-    cost_center_df = pd.read_csv(os.path.join(script_dir, 'cost_center_dim.csv'))
-    vendor_df = pd.read_csv(os.path.join(script_dir, 'vendor_dim.csv'))
-    project_df = pd.read_csv(os.path.join(script_dir, 'project_dim.csv'))
-    
-    # Generate calendar
-    calendar_df = generate_calendar(start_date, end_date)
-    calendar_df.to_csv(os.path.join(script_dir, 'calendar_dim.csv'), index=False)
-    
+def load_dimension_tables(data_dir):
+    """Load the static dimension tables the transactions are drawn from"""
+    return {name: pd.read_csv(os.path.join(data_dir, filename)) for name, filename in DIMENSION_FILES.items()}
+
+def _replicate_members(df, id_col, label_col, scale_factor):
+    """Copy a dimension scale_factor times under new ids, numbering the labels of the copies"""
+    id_offset = df[id_col].max()
+    copies = []
+    for k in range(scale_factor):
+        copy_df = df.copy()
+        copy_df[id_col] = df[id_col] + k * id_offset
+        if k > 0:
+            copy_df[label_col] = df[label_col] + f' {k + 1}'
+        copies.append(copy_df)
+    return pd.concat(copies, ignore_index=True)
+
+def scale_dimension_tables(dims, scale_factor):
+    """Multiply the locations and business units by a TPC-style scale factor"""
+    if scale_factor == 1:
+        return dims
+    scaled = dict(dims)
+    scaled['location'] = _replicate_members(dims['location'], 'location_id', 'subregion', scale_factor)
+    scaled['business_unit'] = _replicate_members(dims['business_unit'], 'bu_id', 'business_unit', scale_factor)
+    return scaled
+
+def write_dimension_tables(dims, data_dir, output_dir):
+    """Write the (possibly scaled) dimension tables next to generated data so the folder is a complete model"""
+    for name, filename in DIMENSION_FILES.items():
+        dims[name].to_csv(os.path.join(output_dir, filename), index=False)
+    for filename in STATIC_FILES:
+        shutil.copyfile(os.path.join(data_dir, filename), os.path.join(output_dir, filename))
+
+def _generate_transactions_loop(calendar_df, dims, rng, density=1):
+    """Generate actuals one transaction at a time (reference engine, reproduces the shipped CSVs)"""
+    if density != 1:
+        raise ValueError("The loop engine only supports scale_factor=1, use the vectorized engine")
+
+    accounts_df = dims['accounts']
+    location_df = dims['location']
+    business_unit_df = dims['business_unit']
+    cost_center_df = dims['cost_center']
+
     # Define the dimensions
     dates = calendar_df['date'].tolist()
     location_ids = location_df['location_id'].tolist()
     business_unit_ids = business_unit_df['bu_id'].tolist()
     cost_center_ids = cost_center_df['cost_center_id'].tolist()
-    vendor_ids = vendor_df['vendor_id'].tolist()
-    project_ids = project_df['project_id'].tolist()
-    segments = ['Corporate', 'Retail', 'Government']
-    
+    vendor_ids = dims['vendor']['vendor_id'].tolist()
+    project_ids = dims['project']['project_id'].tolist()
+
     # Get the list of account numbers
     account_numbers = accounts_df['account_number'].tolist()
     account_mapping = dict(zip(accounts_df['account_number'], accounts_df['pnl_account_name']))
-    
+
     # Create base data for actuals
     actuals_data = []
 
-    # Generate individual transactions for actuals
-    np.random.seed(42)
-    
-    # Create a range of mean values for each account type
-    account_mean_values = {
-        'Gross Revenue': (1000, 5000),
-        'Sales Returns': (-300, -50),
-        'Net Revenue': (700, 4700),
-        'Direct Materials': (-1000, -200),
-        'Direct Labor': (-800, -100),
-        'Manufacturing Overhead': (-400, -50),
-        'Marketing': (-500, -100),
-        'Salaries': (-8000, -2000),
-        'Sales Commissions': (-600, -100),
-        'Travel & Entertainment': (-300, -50),
-        'Rent': (-2000, -500),
-        'Utilities': (-500, -100),
-        'Office Supplies': (-200, -50),
-        'R&D': (-5000, -1000),
-        'Depreciation': (-200, -50),
-        'Amortization': (-100, -20),
-        'Interest': (-50, -10),
-        'Taxes': (-500, -100)
-    }
-    
     # For each day, location, business unit, etc., generate individual transactions
     for date in dates:
         # Convert to datetime if it's not already
         date_dt = pd.to_datetime(date)
         # Skip weekends for some transaction types
-        if date_dt.dayofweek >= 5 and np.random.random() < 0.7:
+        if date_dt.dayofweek >= 5 and rng.random() < 0.7:
             continue
-            
+
         # Each account might have different frequencies
         for account_num in account_numbers:
             pnl_account_name = account_mapping[account_num]
-            
+
             # Some accounts might not have daily transactions
-            if np.random.random() > 0.3:
+            if rng.random() > 0.3:
                 continue
-                
+
             # For each transaction, randomly select from the other dimensions
-            location_id = np.random.choice(location_ids)
+            location_id = rng.choice(location_ids)
             location_info = location_df[location_df['location_id'] == location_id].iloc[0]
             country = location_info['country']
             region = location_info['region']
             subregion = location_info['subregion']
-            
+
             # Randomly select business unit
-            bu_id = np.random.choice(business_unit_ids)
+            bu_id = rng.choice(business_unit_ids)
             bu_info = business_unit_df[business_unit_df['bu_id'] == bu_id].iloc[0]
             business_unit = bu_info['business_unit']
             division = bu_info['division']
-            
+
             # Select segment based on division
             if division == 'Retail':
                 segment = 'Retail'
             elif division in ['Banking', 'Medical']:
                 segment = 'Corporate'
             else:
-                segment = np.random.choice(segments)
-                
+                segment = rng.choice(SEGMENTS)
+
             # Add cost centers, vendors, and projects for expenses only
             cost_center_id = None
             vendor_id = None
             project_id = None
-            
+
             if 'Revenue' not in pnl_account_name:
-                cost_center_id = np.random.choice(cost_center_ids)
+                cost_center_id = rng.choice(cost_center_ids)
                 cost_center_info = cost_center_df[cost_center_df['cost_center_id'] == cost_center_id].iloc[0]
-                
+
                 # Add vendor for certain expense types
-                if pnl_account_name in ['Direct Materials', 'Office Supplies', 'Utilities', 'Marketing']:
-                    vendor_id = np.random.choice(vendor_ids)
-                
+                if pnl_account_name in VENDOR_ACCOUNTS:
+                    vendor_id = rng.choice(vendor_ids)
+
                 # Add project for certain strategic expenses
-                if pnl_account_name in ['Marketing', 'R&D', 'Travel & Entertainment'] and np.random.random() > 0.5:
-                    project_id = np.random.choice(project_ids)
-            
+                if pnl_account_name in PROJECT_ACCOUNTS and rng.random() > 0.5:
+                    project_id = rng.choice(project_ids)
+
             # Filter out combinations that don't make sense
-            if pnl_account_name in ['Depreciation', 'Amortization', 'R&D'] and segment != 'Corporate':
+            if pnl_account_name in CORPORATE_ONLY_ACCOUNTS and segment != 'Corporate':
                 continue
-                
-            if pnl_account_name in ['Direct Materials', 'Direct Labor', 'Manufacturing Overhead'] and segment == 'Government':
+
+            if pnl_account_name in NON_GOVERNMENT_ACCOUNTS and segment == 'Government':
                 continue
-            
+
             # Generate amount based on the account type
-            min_val, max_val = account_mean_values[pnl_account_name]
-            amount = np.random.uniform(min_val, max_val)
-            
-            # Add some randomness based on day of week, month, etc.
-            day_of_week = date_dt.dayofweek
-            month = date_dt.month
-            
+            min_val, max_val = ACCOUNT_MEAN_VALUES[pnl_account_name]
+            amount = rng.uniform(min_val, max_val)
+
             # Month-end effects
             if date_dt.is_month_end:
-                if pnl_account_name in ['Gross Revenue', 'Sales Commissions']:
+                if pnl_account_name in MONTH_END_BOOST_ACCOUNTS:
                     amount *= 1.2  # Month-end boost
                 elif pnl_account_name in ['Depreciation', 'Amortization']:
                     amount *= 1.0  # Consistent monthly
-            
+
             # Quarter-end effects
             if date_dt.is_quarter_end:
-                if pnl_account_name in ['Marketing', 'Sales Commissions']:
+                if pnl_account_name in QUARTER_END_BOOST_ACCOUNTS:
                     amount *= 1.3  # Quarter-end boost
-            
+
             # Create the transaction record with account_number (for actuals)
             # Only include the foreign keys, not the denormalized attributes
             # Keep pnl_account_name temporarily for later filtering
@@ -179,131 +230,771 @@ def generate_synthetic_data(start_date, end_date):
                 'segment': segment,
                 'amount': amount
             }
-            
+
             # Add optional dimension foreign keys if applicable
             if cost_center_id:
                 transaction['cost_center_id'] = cost_center_id
-            
+
             if vendor_id:
                 transaction['vendor_id'] = vendor_id
-            
+
             if project_id:
                 transaction['project_id'] = project_id
-            
+
             actuals_data.append(transaction)
-    
-    # Create the actuals dataframe
-    actuals_df = pd.DataFrame(actuals_data)
-    
-    # Calculate Net Revenue transactions as a reconciliation of Gross Revenue and Sales Returns
+
+    return pd.DataFrame(actuals_data, columns=ACTUALS_COLUMNS)
+
+def _optional_keys(ids, idx, mask):
+    """Pick ids through an index array, leaving NaN where the key does not apply"""
+    keys = np.full(len(idx), np.nan)
+    keys[mask] = ids[idx[mask]]
+    return keys
+
+def _generate_transactions_vectorized(calendar_df, dims, rng, density=1):
+    """Generate actuals as whole arrays: one draw per date x account candidate, no per-row Python
+
+    density repeats every date x account candidate, multiplying the expected transactions per day.
+    """
+    accounts_df = dims['accounts']
+    business_unit_df = dims['business_unit']
+    location_ids = dims['location']['location_id'].to_numpy()
+    business_unit_ids = business_unit_df['bu_id'].to_numpy()
+    cost_center_ids = dims['cost_center']['cost_center_id'].to_numpy()
+    vendor_ids = dims['vendor']['vendor_id'].to_numpy()
+    project_ids = dims['project']['project_id'].to_numpy()
+
+    # Precompute the account rules once per account name, rows then index into them
+    account_numbers = accounts_df['account_number'].to_numpy()
+    name_codes, account_names = pd.factorize(accounts_df['pnl_account_name'])
+    account_names = account_names.to_numpy()
+    is_revenue = np.array(['Revenue' in name for name in account_names])
+    has_vendor = np.isin(account_names, VENDOR_ACCOUNTS)
+    has_project = np.isin(account_names, PROJECT_ACCOUNTS)
+    corporate_only = np.isin(account_names, CORPORATE_ONLY_ACCOUNTS)
+    non_government = np.isin(account_names, NON_GOVERNMENT_ACCOUNTS)
+    month_end_boost = np.where(np.isin(account_names, MONTH_END_BOOST_ACCOUNTS), 1.2, 1.0)
+    quarter_end_boost = np.where(np.isin(account_names, QUARTER_END_BOOST_ACCOUNTS), 1.3, 1.0)
+    min_vals = np.array([ACCOUNT_MEAN_VALUES[name][0] for name in account_names], dtype=float)
+    max_vals = np.array([ACCOUNT_MEAN_VALUES[name][1] for name in account_names], dtype=float)
+
+    # Segment rule per business unit: fixed by division, or -1 when drawn at random
+    divisions = business_unit_df['division'].to_numpy()
+    bu_segment = np.select(
+        [divisions == 'Retail', np.isin(divisions, ['Banking', 'Medical'])],
+        [SEGMENTS.index('Retail'), SEGMENTS.index('Corporate')],
+        -1
+    )
+
+    # Skip weekends for some transaction types
+    weekend = calendar_df['day_of_week'].to_numpy() >= 5
+    active_dates = np.flatnonzero(~(weekend & (rng.random(len(calendar_df)) < 0.7)))
+
+    # Every active date x account is a candidate; some accounts don't have daily transactions
+    date_idx = np.repeat(active_dates, len(account_numbers) * density)
+    account_idx = np.tile(np.repeat(np.arange(len(account_numbers)), density), len(active_dates))
+    keep = rng.random(len(date_idx)) <= 0.3
+    date_idx = date_idx[keep]
+    account_idx = account_idx[keep]
+    name_idx = name_codes[account_idx]
+    n = len(date_idx)
+
+    # Randomly select from the other dimensions
+    location_idx = rng.integers(0, len(location_ids), n)
+    bu_idx = rng.integers(0, len(business_unit_ids), n)
+    segment_code = bu_segment[bu_idx]
+    segment_code = np.where(segment_code < 0, rng.integers(0, len(SEGMENTS), n), segment_code)
+
+    # Add cost centers, vendors, and projects for expenses only
+    expense = ~is_revenue[name_idx]
+    cost_center_id = _optional_keys(cost_center_ids, rng.integers(0, len(cost_center_ids), n), expense)
+    vendor_id = _optional_keys(vendor_ids, rng.integers(0, len(vendor_ids), n), expense & has_vendor[name_idx])
+    project_mask = expense & has_project[name_idx] & (rng.random(n) > 0.5)
+    project_id = _optional_keys(project_ids, rng.integers(0, len(project_ids), n), project_mask)
+
+    # Generate amount based on the account type, with month-end and quarter-end effects
+    amount = rng.uniform(min_vals[name_idx], max_vals[name_idx])
+    amount *= np.where(calendar_df['is_month_end'].to_numpy()[date_idx], month_end_boost[name_idx], 1.0)
+    amount *= np.where(calendar_df['is_quarter_end'].to_numpy()[date_idx], quarter_end_boost[name_idx], 1.0)
+
+    # Filter out combinations that don't make sense
+    valid = ~(corporate_only[name_idx] & (segment_code != SEGMENTS.index('Corporate')))
+    valid &= ~(non_government[name_idx] & (segment_code == SEGMENTS.index('Government')))
+
+    return pd.DataFrame({
+        'date': calendar_df['date'].to_numpy()[date_idx[valid]],
+        'account_number': account_numbers[account_idx[valid]],
+        'pnl_account_name': pd.Categorical.from_codes(name_idx[valid], account_names),
+        'location_id': location_ids[location_idx[valid]],
+        'bu_id': business_unit_ids[bu_idx[valid]],
+        'segment': pd.Categorical.from_codes(segment_code[valid], SEGMENTS),
+        'amount': amount[valid],
+        'cost_center_id': cost_center_id[valid],
+        'vendor_id': vendor_id[valid],
+        'project_id': project_id[valid],
+    })
+
+def reconcile_net_revenue(actuals_df, accounts_df, rng):
+    """Append Net Revenue transactions reconciling Gross Revenue and Sales Returns
+
+    Net revenue is summed per date, business unit, location and segment. Optional
+    dimension keys are copied from the first matching gross revenue row through a
+    join, and groups without any gross revenue are dropped.
+    """
     # First identify account numbers for each category
+    account_mapping = dict(zip(accounts_df['account_number'], accounts_df['pnl_account_name']))
     gross_rev_account_nums = [acc_num for acc_num, acc_name in account_mapping.items() if acc_name == 'Gross Revenue']
     sales_returns_account_nums = [acc_num for acc_num, acc_name in account_mapping.items() if acc_name == 'Sales Returns']
     net_rev_account_nums = [acc_num for acc_num, acc_name in account_mapping.items() if acc_name == 'Net Revenue']
-    
+
     # Filter based on account numbers
-    gross_rev = actuals_df[actuals_df['account_number'].isin(gross_rev_account_nums)].copy()
-    sales_returns = actuals_df[actuals_df['account_number'].isin(sales_returns_account_nums)].copy()
-    
+    gross_rev = actuals_df[actuals_df['account_number'].isin(gross_rev_account_nums)]
+    sales_returns = actuals_df[actuals_df['account_number'].isin(sales_returns_account_nums)]
+
     # Group by the common dimensions
     groupby_cols = ['date', 'bu_id', 'location_id', 'segment']
-    
+
     # Group and sum the amounts
-    gross_rev_grouped = gross_rev.groupby(groupby_cols)['amount'].sum().reset_index()
-    sales_returns_grouped = sales_returns.groupby(groupby_cols)['amount'].sum().reset_index()
-    
+    gross_rev_grouped = gross_rev.groupby(groupby_cols, observed=True)['amount'].sum().reset_index()
+    sales_returns_grouped = sales_returns.groupby(groupby_cols, observed=True)['amount'].sum().reset_index()
+
     # Join the two dataframes
     net_revenue_df = pd.merge(gross_rev_grouped, sales_returns_grouped, on=groupby_cols, how='outer', suffixes=('_gross', '_returns'))
-    net_revenue_df.fillna(0, inplace=True)
-    
+    net_revenue_df[['amount_gross', 'amount_returns']] = net_revenue_df[['amount_gross', 'amount_returns']].fillna(0)
+
     # Calculate net revenue
     net_revenue_df['amount'] = net_revenue_df['amount_gross'] + net_revenue_df['amount_returns']
-    
-    # Add the necessary columns for net revenue transactions
-    net_revenue_df = net_revenue_df[groupby_cols + ['amount']].copy()
-    
-    # Add the required columns to match the actuals_df
-    for idx, row in net_revenue_df.iterrows():
-        # Create a new transaction for Net Revenue with only the necessary keys
-        net_rev_transaction = {
-            'date': row['date'],
-            'account_number': np.random.choice(net_rev_account_nums),
-            'location_id': row['location_id'],
-            'bu_id': row['bu_id'],
-            'segment': row['segment'],
-            'amount': row['amount']
-        }
-        
-        # Find a matching gross revenue row to copy optional dimensions
-        matching_gross = gross_rev[
-            (gross_rev['date'] == row['date']) & 
-            (gross_rev['bu_id'] == row['bu_id']) &
-            (gross_rev['location_id'] == row['location_id']) &
-            (gross_rev['segment'] == row['segment'])
-        ]
-        
-        if not matching_gross.empty:
-            # Copy optional dimension keys if they exist
-            for key in ['cost_center_id', 'vendor_id', 'project_id']:
-                if key in matching_gross.iloc[0] and pd.notna(matching_gross.iloc[0][key]):
-                    net_rev_transaction[key] = matching_gross.iloc[0][key]
-            
-            # Append to actuals data
-            actuals_data.append(net_rev_transaction)
-    
-    # Recreate actuals dataframe with net revenue transactions
-    actuals_df = pd.DataFrame(actuals_data)
-    
-    # Remove the temporary pnl_account_name column from actuals
-    if 'pnl_account_name' in actuals_df.columns:
-        actuals_df = actuals_df.drop(columns=['pnl_account_name'])
-    
-    # Save the actuals data
-    actuals_df.to_csv(os.path.join(script_dir, 'actuals.csv'), index=False)
-    
-    # Create budget data (at business unit and month level)
-    # Note: budget uses pnl_account_name instead of account_number
-    
-    # Extract month-year from date
-    actuals_df['month_year'] = pd.to_datetime(actuals_df['date']).dt.strftime('%Y-%m')
-    
-    # Get the account mapping for budget (which uses pnl_account_name)
-    account_to_name = dict(zip(accounts_df['account_number'], accounts_df['pnl_account_name']))
-    
-    # Create a temporary df with the pnl_account_name for grouping
-    budget_prep_df = actuals_df.copy()
-    budget_prep_df['pnl_account_name'] = budget_prep_df['account_number'].map(account_to_name)
-    
-    # Group actuals by month-year and business unit
-    # Budget is at a higher level of granularity - only month_year, bu_id, pnl_account_name
-    budget_groupby_cols = ['month_year', 'bu_id', 'pnl_account_name']
-    budget_df = budget_prep_df.groupby(budget_groupby_cols)['amount'].sum().reset_index()
-    
-    # Adjust budget amounts to be slightly different from actuals
-    budget_df['amount'] = budget_df['amount'] * np.random.uniform(0.9, 1.1, len(budget_df))
-    
+    net_revenue_df = net_revenue_df[groupby_cols + ['amount']]
+
+    # Draw a Net Revenue account for every group, in group order
+    net_revenue_df['account_number'] = rng.choice(net_rev_account_nums, size=len(net_revenue_df))
+
+    # Copy optional dimension keys from the first matching gross revenue row
+    # (inner join: groups with only sales returns don't get a Net Revenue transaction)
+    first_gross = gross_rev.drop_duplicates(subset=groupby_cols)[groupby_cols + OPTIONAL_KEYS]
+    net_revenue_df = net_revenue_df.merge(first_gross, on=groupby_cols, how='inner')
+
+    # Append to actuals, keeping the actuals column layout and dtypes
+    net_revenue_df = net_revenue_df.reindex(columns=actuals_df.columns).astype(actuals_df.dtypes.to_dict())
+    return pd.concat([actuals_df, net_revenue_df], ignore_index=True)
+
+TRANSACTION_ENGINES = {
+    'loop': _generate_transactions_loop,
+    'vectorized': _generate_transactions_vectorized,
+}
+
+def pnl_accounts(accounts_df):
+    """Account numbers, the code of each one's P&L account, and the P&L account names (sorted, indexed by code)"""
+    codes, names = pd.factorize(accounts_df['pnl_account_name'], sort=True)
+    return pd.Index(accounts_df['account_number']), codes, names.to_numpy(dtype=object)
+
+def _budget_partial(actuals_df, calendar_df, accounts):
+    """Sum a block of actuals to the budget grain on integer keys: calendar month (months since year 0),
+    bu_id and P&L account code (see pnl_accounts); build_budget turns them into labels"""
+    # Calendar month of each transaction, by looking its date up in the calendar
+    calendar_months = calendar_df['year'].to_numpy(np.int64) * 12 + calendar_df['month'].to_numpy(np.int64) - 1
+    date_position = pd.DatetimeIndex(calendar_df['date']).get_indexer(actuals_df['date'])
+    if (date_position < 0).any():
+        missing = pd.unique(actuals_df['date'].to_numpy()[date_position < 0])
+        raise ValueError(f"{len(missing)} actuals date(s) not in the calendar, e.g. {pd.Timestamp(missing[0]).date()}")
+    month_key = calendar_months[date_position]
+
+    # Budget uses the P&L account instead of account_number
+    account_numbers, account_codes, _ = accounts
+    position = account_numbers.get_indexer(actuals_df['account_number'])
+    if (position < 0).any():
+        missing = pd.unique(actuals_df['account_number'].to_numpy()[position < 0])
+        raise ValueError(f"{len(missing)} actuals account number(s) not in accounts: {[int(number) for number in sorted(missing)[:10]]}")
+    pnl_account = account_codes[position]
+
+    amount = pd.Series(actuals_df['amount'].to_numpy())
+    keys = [month_key, actuals_df['bu_id'].to_numpy(), pnl_account]
+    partial = amount.groupby(keys).sum()
+    partial.index.names = ['month_key', 'bu_id', 'pnl_account']
+    return partial
+
+# Budget variance components: each gives a factor per budget line from its calendar month (1-12) and
+# business unit, and budget amounts are the summed actuals times the product of the chosen components.
+# They work on the budget lines only, never on the transactions.
+SEASONAL_AMPLITUDE = 0.08
+BU_BIAS_SD = 0.05
+BU_BIAS_STREAM = 2
+
+def _uniform_variance(months, bu_ids, rng, seed):
+    """Independent noise of up to 10% either way on every budget line"""
+    return rng.uniform(0.9, 1.1, len(months))
+
+def _seasonal_variance(months, bu_ids, rng, seed):
+    """A plan that misses the seasonality: over actuals in winter, under them in summer"""
+    return 1 + SEASONAL_AMPLITUDE * np.cos(2 * np.pi * (months - 1) / 12)
+
+def _bu_bias_variance(months, bu_ids, rng, seed):
+    """Optimistic or conservative business units: a fixed factor per business unit, the same in every month"""
+    # Drawn from the seed and the unit alone, so monthly shards agree on it
+    units, inverse = np.unique(bu_ids, return_inverse=True)
+    bias = np.array([np.random.default_rng([seed, BU_BIAS_STREAM, int(unit)]).normal(1.0, BU_BIAS_SD) for unit in units])
+    return bias[inverse]
+
+BUDGET_VARIANCE_MODELS = {
+    'uniform': _uniform_variance,
+    'seasonal': _seasonal_variance,
+    'bu_bias': _bu_bias_variance,
+}
+
+def build_budget(budget_totals, rng, pnl_account_names, variance=('uniform',), seed=42):
+    """Turn the summed actuals into budget rows, different from actuals by the variance components"""
+    budget_totals = budget_totals.sort_index()
+    month_key = budget_totals.index.get_level_values('month_key').to_numpy()
+    bu_id = budget_totals.index.get_level_values('bu_id').to_numpy()
+    pnl_account = budget_totals.index.get_level_values('pnl_account').to_numpy()
+
+    # Adjust budget amounts to be different from actuals
+    factor = np.ones(len(budget_totals))
+    for component in variance:
+        factor *= BUDGET_VARIANCE_MODELS[component](month_key % 12 + 1, bu_id, rng, seed)
+
+    # Labels only now, for the (few) distinct months
+    months, month_position = np.unique(month_key, return_inverse=True)
+    month_labels = np.array([f'{key // 12:04d}-{key % 12 + 1:02d}' for key in months], dtype=object)
+
     # Select only needed columns - normalized approach
-    budget_df = budget_df[['month_year', 'bu_id', 'pnl_account_name', 'amount']]
-    
+    return pd.DataFrame({
+        'month_year': month_labels[month_position],
+        'bu_id': bu_id,
+        'pnl_account_name': pnl_account_names[pnl_account],
+        'amount': budget_totals.to_numpy() * factor,
+    })
+
+def iter_actuals_chunks(calendar_df, dims, rng, engine='vectorized', scale_factor=1, chunk_by_month=False):
+    """Yield actuals (including the Net Revenue reconciliation) one block of dates at a time
+
+    With chunk_by_month=True each block is a single calendar month, so memory
+    stays bounded by the size of one month regardless of the date range.
+    """
+    if chunk_by_month:
+        blocks = (block for _, block in calendar_df.groupby('month_year', sort=True))
+    else:
+        blocks = [calendar_df]
+
+    for block in blocks:
+        actuals_df = TRANSACTION_ENGINES[engine](block.reset_index(drop=True), dims, rng, density=scale_factor)
+
+        # Calculate Net Revenue transactions as a reconciliation of Gross Revenue and Sales Returns
+        yield reconcile_net_revenue(actuals_df, dims['accounts'], rng)
+
+def output_dtypes(calendar_df, dims, amount_dtype='float64'):
+    """Compact dtypes for the generated tables, applied when writing Parquet or Arrow
+
+    Keys become int16/int32 (nullable Int16 for the optional ones) and the
+    repeated labels categoricals with fixed categories, so every chunk and
+    shard shares the same dictionary.
+    """
+    month_year = pd.CategoricalDtype(calendar_df['month_year'].unique())
+    return {
+        'actuals': {
+            'account_number': 'int16',
+            'location_id': 'int32',
+            'bu_id': 'int32',
+            'segment': pd.CategoricalDtype(SEGMENTS),
+            'amount': amount_dtype,
+            'cost_center_id': 'Int16',
+            'vendor_id': 'Int16',
+            'project_id': 'Int16',
+        },
+        'budget': {
+            'month_year': month_year,
+            'bu_id': 'int32',
+            'pnl_account_name': pd.CategoricalDtype(dims['accounts']['pnl_account_name'].unique()),
+            'amount': amount_dtype,
+        },
+        'calendar_dim': {
+            'day': 'int8',
+            'month': 'int8',
+            'month_name': pd.CategoricalDtype(calendar_df['month_name'].unique()),
+            'quarter': 'int8',
+            'year': 'int16',
+            'month_year': month_year,
+            'day_of_week': 'int8',
+            'day_name': pd.CategoricalDtype(calendar_df['day_name'].unique()),
+            'week_of_year': 'int8',
+        },
+    }
+
+def _month_partitions(df):
+    """Split a table into calendar months (by month_year, or by date for actuals)"""
+    if 'month_year' in df.columns:
+        months = df['month_year']
+    else:
+        months = df['date'].dt.year * 100 + df['date'].dt.month
+    return (part for _, part in df.groupby(months, sort=True, observed=True))
+
+class TableWriter:
+    """Write a table chunk by chunk as CSV, or as Parquet/Arrow IPC with one row group per month"""
+
+    def __init__(self, path, output_format='csv', dtypes=None):
+        self.path = path
+        self.output_format = output_format
+        self.dtypes = dtypes or {}
+        self._writer = None
+        self._schema = None
+        self._rows = 0
+
+    def write(self, df):
+        if self.output_format == 'csv':
+            df.to_csv(self.path, mode='a' if self._rows else 'w', header=not self._rows, index=False)
+            self._rows += len(df)
+            return
+
+        import pyarrow as pa
+
+        df = df.astype({col: dtype for col, dtype in self.dtypes.items() if col in df.columns})
+        for part in _month_partitions(df):
+            self._write_arrow(pa.Table.from_pandas(part, preserve_index=False))
+        self._rows += len(df)
+
+    def write_file(self, path, hold_last=False):
+        """Copy a Parquet/Arrow file written by a TableWriter, one row group at a time
+
+        With hold_last=True the last row group is returned (as a DataFrame) instead
+        of written, so rows of the same month can still be added to it.
+        """
+        import pyarrow as pa
+        if self.output_format == 'parquet':
+            import pyarrow.parquet as pq
+            source = pq.ParquetFile(path)
+            groups = (source.read_row_group(i) for i in range(source.num_row_groups))
+        else:
+            groups = (pa.Table.from_batches([batch]) for batch in _arrow_batches(path))
+
+        previous = None
+        for group in groups:
+            if previous is not None:
+                self._write_arrow(previous)
+            previous = group
+        if previous is None or not hold_last:
+            if previous is not None:
+                self._write_arrow(previous)
+            return None
+        return previous.to_pandas()
+
+    def _write_arrow(self, table):
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._open(table.schema)
+        elif not table.schema.equals(self._schema):
+            # e.g. a dictionary index type read back differently from the file being copied
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+
+    def _open(self, schema):
+        if self.output_format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.path, schema)
+        import pyarrow as pa
+        return pa.ipc.new_file(self.path, schema)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_table(df, path, output_format='csv', dtypes=None):
+    """Write a whole table in one go"""
+    with TableWriter(path, output_format, dtypes) as writer:
+        writer.write(df)
+
+def append_table(df, path, output_format='csv', dtypes=None):
+    """Add rows to the end of a table written by TableWriter (created if missing)
+
+    CSV rows are appended in place; Parquet and Arrow files can't be appended
+    to, so they are copied over with the new rows into a new file, where rows
+    of the file's last month join its row group (one row group per month).
+    """
+    if not os.path.exists(path):
+        write_table(df, path, output_format, dtypes)
+    elif output_format == 'csv':
+        df.to_csv(path, mode='a', header=False, index=False)
+    else:
+        with TableWriter(path + '.tmp', output_format, dtypes) as writer:
+            last = writer.write_file(path, hold_last=True)
+            if last is not None:
+                df = df.astype({col: dtype for col, dtype in writer.dtypes.items() if col in df.columns})
+                df = pd.concat([last, df], ignore_index=True)
+            writer.write(df)
+        os.replace(path + '.tmp', path)
+
+def read_table(path, output_format='csv'):
+    """Read back a whole table written by TableWriter"""
+    if output_format == 'csv':
+        # Exact floats, so rows rewritten after an append come out unchanged
+        df = pd.read_csv(path, float_precision='round_trip')
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        return df
+    if output_format == 'parquet':
+        return pd.read_parquet(path)
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_pandas()
+
+def _read_rows_since(path, output_format, start):
+    """Rows dated on or after `start` from a table written by TableWriter, scanned a block at a time"""
+    if output_format == 'csv':
+        blocks = pd.read_csv(path, chunksize=500_000, parse_dates=['date'], float_precision='round_trip')
+    elif output_format == 'parquet':
+        # Row groups are months, so their statistics skip all but the last ones
+        import pyarrow.parquet as pq
+        return pq.read_table(path, filters=[('date', '>=', start)]).to_pandas()
+    else:
+        blocks = (batch.to_pandas() for batch in _arrow_batches(path))
+    rows = [block[block['date'] >= start] for block in blocks]
+    return pd.concat([block for block in rows if len(block)] or rows[:1], ignore_index=True)
+
+def _arrow_batches(path):
+    """Record batches (one per row group) of an Arrow IPC file"""
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+def _generate_sequential(calendar_df, dims, engine, seed, scale_factor, stream, output_dir, output_format, dtypes,
+                         budget_variance):
+    """Generate actuals in one process from a single random stream, returning the row count and budget"""
+    # Generate individual transactions for actuals
+    # The loop engine keeps the legacy global-seed stream, the vectorized one a Generator
+    if engine == 'loop':
+        rng = np.random.RandomState(seed)
+    else:
+        rng = np.random.default_rng(seed)
+
+    # Create budget data (at business unit and month level) from running partial sums
+    accounts = pnl_accounts(dims['accounts'])
+    budget_totals = None
+    actuals_count = 0
+
+    actuals_path = os.path.join(output_dir, 'actuals' + OUTPUT_FORMATS[output_format])
+    chunks = iter_actuals_chunks(calendar_df, dims, rng, engine=engine, scale_factor=scale_factor, chunk_by_month=stream)
+    with TableWriter(actuals_path, output_format, dtypes['actuals']) as writer:
+        for actuals_df in chunks:
+            # Remove the temporary pnl_account_name column from actuals
+            actuals_df = actuals_df.drop(columns=['pnl_account_name'])
+
+            # Save (append) the actuals data
+            writer.write(actuals_df)
+            actuals_count += len(actuals_df)
+
+            partial = _budget_partial(actuals_df, calendar_df, accounts)
+            budget_totals = partial if budget_totals is None else budget_totals.add(partial, fill_value=0)
+
+    budget_df = build_budget(budget_totals, rng, accounts[2], budget_variance, seed)
+    return actuals_count, budget_df
+
+def shard_seeds(seed, month_key):
+    """Independent transaction and budget seed sequences for one calendar month
+
+    The seeds only depend on the base seed and the month, so a month comes out
+    bit-identical whichever worker generates it and however many workers run.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(month_key,)).spawn(2)
+
+# Appended days draw from their own branch of their month's seed tree (children 0 and 1 are the shard streams)
+DAILY_STREAM = 2
+
+def day_seed(seed, date):
+    """Seed sequence for the transactions of one day appended to existing data
+
+    Like shard_seeds it only depends on the base seed and the day, so the rows of a
+    day are the same whether it is appended alone or within a longer period.
+    """
+    month_key = date.year * 12 + date.month - 1
+    return np.random.SeedSequence(seed, spawn_key=(month_key, DAILY_STREAM, date.day))
+
+def _month_key(calendar_block):
+    """Months since year 0 for the first date of a calendar block"""
+    return int(calendar_block['year'].iat[0]) * 12 + int(calendar_block['month'].iat[0]) - 1
+
+def _generate_shard(seed, month_key, calendar_block, dims, scale_factor, path, output_format, dtypes):
+    """Generate one month of actuals in a worker process, returning its budget partial sums"""
+    transactions_seed, _ = shard_seeds(seed, month_key)
+    rng = np.random.default_rng(transactions_seed)
+
+    actuals_df = next(iter_actuals_chunks(calendar_block, dims, rng, scale_factor=scale_factor))
+    actuals_df = actuals_df.drop(columns=['pnl_account_name'])
+    write_table(actuals_df, path, output_format, dtypes['actuals'])
+
+    return month_key, len(actuals_df), _budget_partial(actuals_df, calendar_block, pnl_accounts(dims['accounts']))
+
+def _generate_sharded(calendar_df, dims, seed, scale_factor, output_dir, workers, output_format, dtypes, budget_variance):
+    """Generate actuals month by month on a process pool and merge the budget from the shard partials"""
+    parts_dir = os.path.join(output_dir, ACTUALS_PARTS_DIR)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_generate_shard, seed, _month_key(block), block.reset_index(drop=True), dims,
+                            scale_factor, os.path.join(parts_dir, f'part-{month_year}{OUTPUT_FORMATS[output_format]}'),
+                            output_format, dtypes)
+            for month_year, block in calendar_df.groupby('month_year', sort=True)
+        ]
+        results = [future.result() for future in futures]
+
+    # Each shard holds complete months, so its budget noise comes from the month's own seed
+    pnl_account_names = pnl_accounts(dims['accounts'])[2]
+    budget_df = pd.concat(
+        [build_budget(partial, np.random.default_rng(shard_seeds(seed, month_key)[1]), pnl_account_names, budget_variance, seed)
+         for month_key, _, partial in results],
+        ignore_index=True
+    )
+    return sum(count for _, count, _ in results), budget_df
+
+def _remove_stale_actuals(output_dir, sharded):
+    """Drop actuals left by a previous run in the other layout (single file vs. monthly parts)"""
+    if sharded:
+        stale = [os.path.join(output_dir, 'actuals' + extension) for extension in OUTPUT_FORMATS.values()]
+    else:
+        stale = glob.glob(os.path.join(output_dir, ACTUALS_PARTS_DIR, 'part-*'))
+    for path in stale:
+        if os.path.exists(path):
+            os.remove(path)
+
+def generate_synthetic_data(start_date, end_date, engine=None, seed=42, scale_factor=1,
+                            stream=False, output_dir=None, workers=None, output_format='csv', amount_dtype='float64',
+                            budget_variance=('uniform',)):
+    """Generate synthetic P&L data with the specified date range
+
+    engine='loop' is the original row-by-row generator and reproduces the CSVs
+    shipped in this folder for seed 42 (check_generator.py verifies it, and the
+    Net Revenue step against its original form); engine='vectorized' draws whole arrays
+    with the same statistical shape and is orders of magnitude faster. By default
+    (engine=None) data written into this folder uses 'loop' and any other output_dir
+    'vectorized'. Only unscaled, unstreamed, unsharded CSV output can be written into
+    this folder; the other modes need a separate output_dir.
+
+    scale_factor multiplies locations, business units and transactions per day
+    (TPC-style, 1 = the shipped dataset). stream=True generates and appends the
+    actuals one month at a time and builds the budget from running partial sums.
+
+    workers=N generates every calendar month as a shard on a pool of N processes,
+    writing actuals/part-YYYY-MM.csv files. Each month has its own SeedSequence,
+    so the output does not depend on the number of workers.
+
+    output_format='parquet' or 'arrow' writes actuals, budget and calendar_dim
+    with compact dtypes (see output_dtypes) and one row group per month;
+    amount_dtype='float32' halves the size of the amount columns.
+
+    budget_variance lists the components (see BUDGET_VARIANCE_MODELS) whose product
+    makes the budget differ from the summed actuals: 'uniform' noise, a 'seasonal'
+    miss and a per-business-unit bias ('bu_bias').
+    """
+    # Get the directory where the script is located
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.abspath(output_dir or script_dir)
+
+    if engine is None:
+        engine = 'loop' if output_dir == script_dir else 'vectorized'
+    if engine not in TRANSACTION_ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Use one of: {', '.join(TRANSACTION_ENGINES)}")
+    if scale_factor < 1:
+        raise ValueError("scale_factor must be a positive integer")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output_format '{output_format}'. Use one of: {', '.join(OUTPUT_FORMATS)}")
+    unknown = [component for component in budget_variance if component not in BUDGET_VARIANCE_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown budget_variance {unknown}. Use any of: {', '.join(BUDGET_VARIANCE_MODELS)}")
+    if scale_factor != 1 and output_dir == script_dir:
+        raise ValueError("A scale_factor other than 1 rewrites the dimension tables, use a separate output_dir")
+    if workers is not None and output_dir == script_dir:
+        raise ValueError("Sharded generation (workers) replaces the shipped actuals.csv, use a separate output_dir")
+    if stream and output_dir == script_dir:
+        raise ValueError("Streaming draws the random stream in a different order than the shipped CSVs, "
+                         "use a separate output_dir")
+    if output_format != 'csv' and output_dir == script_dir:
+        raise ValueError(f"{output_format} output would shadow the shipped CSVs, use a separate output_dir")
+    if workers is not None and engine != 'vectorized':
+        raise ValueError("Sharded generation (workers) requires the vectorized engine")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Load dimension tables, scaled ones are written next to the generated data
+    dims = scale_dimension_tables(load_dimension_tables(script_dir), scale_factor)
+    if output_dir != script_dir:
+        write_dimension_tables(dims, script_dir, output_dir)
+
+    # Generate calendar
+    calendar_df = generate_calendar(start_date, end_date)
+    dtypes = output_dtypes(calendar_df, dims, amount_dtype)
+    extension = OUTPUT_FORMATS[output_format]
+    _remove_stale_actuals(output_dir, sharded=workers is not None)
+    write_table(calendar_df, os.path.join(output_dir, 'calendar_dim' + extension), output_format, dtypes['calendar_dim'])
+
+    if workers is not None:
+        actuals_count, budget_df = _generate_sharded(calendar_df, dims, seed, scale_factor, output_dir, workers,
+                                                     output_format, dtypes, budget_variance)
+    else:
+        actuals_count, budget_df = _generate_sequential(calendar_df, dims, engine, seed, scale_factor, stream,
+                                                        output_dir, output_format, dtypes, budget_variance)
+
     # Save the budget data - using pnl_account_name instead of account_number
     # and month_year instead of separate month and year fields
-    budget_df.to_csv(os.path.join(script_dir, 'budget.csv'), index=False)
-    
+    write_table(budget_df, os.path.join(output_dir, 'budget' + extension), output_format, dtypes['budget'])
+
     print(f"Synthetic data generated successfully for period {start_date} to {end_date}")
-    print(f"- Generated {len(actuals_df):,} actual transactions")
+    print(f"- Generated {actuals_count:,} actual transactions")
     print(f"- Generated {len(budget_df):,} budget entries")
     print(f"- Calendar dimension created with {len(calendar_df):,} date records")
-    
+
+def _generate_days(calendar_block, dims, seed, scale_factor):
+    """Generate the actuals of a block of dates one day at a time, each from its day_seed"""
+    days = []
+    for i in range(len(calendar_block)):
+        day = calendar_block.iloc[i:i + 1].reset_index(drop=True)
+        rng = np.random.default_rng(day_seed(seed, day['date'].iat[0]))
+        actuals_df = next(iter_actuals_chunks(day, dims, rng, scale_factor=scale_factor))
+        if len(actuals_df):
+            days.append(actuals_df.drop(columns=['pnl_account_name']))
+    if not days:
+        return pd.DataFrame(columns=[col for col in ACTUALS_COLUMNS if col != 'pnl_account_name'])
+    return pd.concat(days, ignore_index=True)
+
+def _existing_output_format(output_dir):
+    """Format of the tables generated in output_dir, told by its calendar_dim file"""
+    found = [name for name, extension in OUTPUT_FORMATS.items()
+             if os.path.exists(os.path.join(output_dir, 'calendar_dim' + extension))]
+    if not found:
+        raise FileNotFoundError(f"No generated calendar_dim in {output_dir}, run generate_synthetic_data first")
+    if len(found) > 1:
+        raise ValueError(f"{output_dir} has calendar_dim in several formats ({', '.join(found)}), pass output_format")
+    return found[0]
+
+def append_synthetic_data(end_date, seed=42, output_dir=None, output_format=None, budget_variance=('uniform',)):
+    """Extend previously generated data to end_date without regenerating it
+
+    The day after the last date of calendar_dim is the first one generated. Each
+    appended day draws from its own day_seed, so data grown a day at a time is
+    identical to data appended in one go (pass the seed and budget_variance of the
+    original run). Actuals rows are added to the end of the existing file, or of the
+    month's part file for sharded output; the calendar is extended and the budget
+    rows of the months that got new days are rebuilt from all of their actuals,
+    leaving the other months as they were.
+
+    Appended days use the vectorized engine at the scale factor of the existing
+    dimension tables; the format and layout (single file or monthly parts) are
+    the existing ones. Parquet and Arrow files are rewritten to append to them,
+    so frequent appends are cheapest on monthly parts (generated with workers).
+    output_dir must be a generated dataset, the shipped one in this folder is
+    never appended to.
+    """
+    unknown = [component for component in budget_variance if component not in BUDGET_VARIANCE_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown budget_variance {unknown}. Use any of: {', '.join(BUDGET_VARIANCE_MODELS)}")
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.abspath(output_dir or script_dir)
+    if output_dir == script_dir:
+        raise ValueError("Appending would change the shipped CSVs, use the output_dir of a generated dataset")
+    output_format = output_format or _existing_output_format(output_dir)
+    extension = OUTPUT_FORMATS[output_format]
+
+    # Days after the last generated one, on the calendar rebuilt from the first one
+    calendar_path = os.path.join(output_dir, 'calendar_dim' + extension)
+    existing_dates = read_table(calendar_path, output_format)['date']
+    first_date, last_date = existing_dates.min(), existing_dates.max()
+    if pd.Timestamp(end_date) <= last_date:
+        print(f"Nothing to append: data already runs to {last_date.date()}")
+        return
+    calendar_df = generate_calendar(first_date, end_date)
+    new_days = calendar_df[calendar_df['date'] > last_date]
+
+    # The dimension tables written with the data give its scale factor
+    dims = load_dimension_tables(output_dir)
+    scale_factor, remainder = divmod(len(dims['business_unit']), len(load_dimension_tables(script_dir)['business_unit']))
+    if remainder:
+        raise ValueError(f"The business units in {output_dir} are not a scaled copy of the shipped ones")
+
+    budget_path = os.path.join(output_dir, 'budget' + extension)
+    existing_budget = read_table(budget_path, output_format)
+    amount_dtype = 'float64' if output_format == 'csv' else str(existing_budget['amount'].dtype)
+    dtypes = output_dtypes(calendar_df, dims, amount_dtype)
+    parts = glob.glob(os.path.join(output_dir, ACTUALS_PARTS_DIR, 'part-*'))
+    accounts = pnl_accounts(dims['accounts'])
+
+    actuals_count = 0
+    budget_months = []
+    for month_year, block in new_days.groupby('month_year', sort=True):
+        if parts:
+            actuals_path = os.path.join(output_dir, ACTUALS_PARTS_DIR, f'part-{month_year}{extension}')
+        else:
+            actuals_path = os.path.join(output_dir, 'actuals' + extension)
+        actuals_df = _generate_days(block, dims, seed, scale_factor)
+
+        # The budget sums the rows as stored, and for a month already started its earlier
+        # actuals too (read back before appending), so it doesn't depend on how days arrived
+        month_actuals = actuals_df if output_format == 'csv' else actuals_df.astype(dtypes['actuals'])
+        month_start = block['date'].iat[0].replace(day=1)
+        if block['date'].iat[0] > month_start and os.path.exists(actuals_path):
+            earlier = _read_rows_since(actuals_path, output_format, month_start)
+            month_actuals = pd.concat([df for df in (earlier, month_actuals) if len(df)] or [earlier], ignore_index=True)
+
+        if len(actuals_df):
+            append_table(actuals_df, actuals_path, output_format, dtypes['actuals'])
+            actuals_count += len(actuals_df)
+
+        # (days without transactions, e.g. a skipped weekend, leave a new month without budget lines)
+        if len(month_actuals):
+            partial = _budget_partial(month_actuals, calendar_df, accounts)
+            budget_rng = np.random.default_rng(shard_seeds(seed, _month_key(block))[1])
+            budget_months.append(build_budget(partial, budget_rng, accounts[2], budget_variance, seed))
+
+    # Budget months that got new days are replaced, the others kept
+    months = new_days['month_year'].unique()
+    existing_budget['month_year'] = existing_budget['month_year'].astype(str)
+    existing_budget = existing_budget[~existing_budget['month_year'].isin(months)]
+    budget_df = pd.concat([existing_budget] + budget_months, ignore_index=True)
+    write_table(budget_df, budget_path, output_format, dtypes['budget'])
+    write_table(calendar_df, calendar_path, output_format, dtypes['calendar_dim'])
+
+    print(f"Synthetic data appended for period {new_days['date'].iat[0].date()} to {end_date}")
+    print(f"- Generated {actuals_count:,} actual transactions")
+    print(f"- Rebuilt the budget of {len(months)} month(s), now {len(budget_df):,} budget entries")
+    print(f"- Calendar dimension extended to {len(calendar_df):,} date records")
+
 # If this script is run directly, allow dynamic selection of date range
 if __name__ == "__main__":
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='Generate synthetic P&L data for a specific date range')
     parser.add_argument('--start_date', type=str, default='2023-01-01', help='Start date in YYYY-MM-DD format')
     parser.add_argument('--end_date', type=str, default='2023-12-31', help='End date in YYYY-MM-DD format')
-    
+    parser.add_argument('--engine', choices=sorted(TRANSACTION_ENGINES), default=None,
+                        help="Transaction engine; 'loop' reproduces the shipped CSVs (seed 42) and is the default "
+                             "when writing into this folder, 'vectorized' otherwise")
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--scale_factor', type=int, default=1,
+                        help='Multiply locations, business units and transaction density (requires --output_dir)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Generate and append actuals one month at a time (requires --output_dir)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Generate one shard per month on N processes (writes actuals/part-YYYY-MM.csv, requires --output_dir)')
+    parser.add_argument('--output_format', choices=list(OUTPUT_FORMATS), default=None,
+                        help='csv (default), or typed parquet/arrow files with one row group per month '
+                             '(requires --output_dir); with --append, the format to extend')
+    parser.add_argument('--amount_dtype', choices=['float64', 'float32'], default='float64',
+                        help='Storage type of the amount columns in parquet/arrow output')
+    parser.add_argument('--budget_variance', nargs='+', choices=list(BUDGET_VARIANCE_MODELS), default=['uniform'],
+                        help='Components making the budget differ from actuals (their factors multiply)')
+    parser.add_argument('--output_dir', type=str, default=None, help='Where to write the tables (default: this folder)')
+    parser.add_argument('--append', action='store_true',
+                        help='Extend the tables in --output_dir (required) from their last date to --end_date '
+                             '(--start_date is ignored)')
+
     args = parser.parse_args()
-    
+
     # Validate dates
     try:
         pd.to_datetime(args.start_date)
@@ -311,6 +1002,15 @@ if __name__ == "__main__":
     except ValueError:
         print("Error: Invalid date format. Please use YYYY-MM-DD format.")
         exit(1)
-    
+
+    if args.append:
+        print(f"Appending synthetic P&L data up to {args.end_date}")
+        append_synthetic_data(args.end_date, seed=args.seed, output_dir=args.output_dir,
+                              output_format=args.output_format, budget_variance=args.budget_variance)
+        exit(0)
+
     print(f"Generating synthetic P&L data from {args.start_date} to {args.end_date}")
-    generate_synthetic_data(args.start_date, args.end_date)
+    generate_synthetic_data(args.start_date, args.end_date, engine=args.engine, seed=args.seed,
+                            scale_factor=args.scale_factor, stream=args.stream, output_dir=args.output_dir,
+                            workers=args.workers, output_format=args.output_format or 'csv',
+                            amount_dtype=args.amount_dtype, budget_variance=args.budget_variance)
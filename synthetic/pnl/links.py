@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Nullable counterpart of each NumPy integer type, for key columns that link rows can leave missing
+NULLABLE_INTEGERS = {
+    **{np.dtype(f'int{bits}'): f'Int{bits}' for bits in (8, 16, 32, 64)},
+    **{np.dtype(f'uint{bits}'): f'UInt{bits}' for bits in (8, 16, 32, 64)},
+}
+
+def combination_codes(df, columns):
+    """Dense integer code per row for its combination of values in `columns` (missing values included),
+    plus the position of the first row of each combination
+
+    Each column is factorized on its own and the codes are combined arithmetically,
+    so rows are deduplicated by hashing integers instead of comparing strings.
+    """
+    combined = np.zeros(len(df), dtype=np.int64)
+    cardinality = 1
+    for col in columns:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        if cardinality * len(uniques) >= 2**62:
+            # Re-number before the mixed-radix code could overflow
+            combined, distinct = pd.factorize(combined)
+            cardinality = len(distinct)
+        combined = combined * len(uniques) + codes
+        cardinality *= len(uniques)
+    codes, _ = pd.factorize(combined)
+    # factorize numbers combinations in order of appearance, so each one first occurs
+    # where the running maximum of the codes goes up (same as np.unique(codes, return_index=True), without sorting)
+    new = np.ones(len(codes), dtype=bool)
+    new[1:] = codes[1:] > np.maximum.accumulate(codes)[:-1]
+    return codes, np.flatnonzero(new)
+
+
+def _positions(rows, reference, columns):
+    """Position of each row's combination of `columns` in `reference` (whose combinations are distinct), -1 if absent"""
+    stacked = pd.concat([reference[columns], rows[columns]], ignore_index=True)
+    codes, first = combination_codes(stacked, columns)
+    position = np.full(len(first), -1, dtype=np.int64)
+    position[codes[:len(reference)]] = np.arange(len(reference))
+    return position[codes[len(reference):]]
+
+
+def _drop_columns(df, columns):
+    # A new frame sharing the remaining columns' data; DataFrame.drop copies them (without copy-on-write)
+    return pd.DataFrame({col: df[col] for col in df.columns if col not in columns}, copy=False)
+
+
+def _key_dtype(n):
+    return 'int32' if n < 2**31 else 'int64'
+
+
+def build_link_table(facts, keys, lookups=(), key_names=None):
+    """Bridge several fact tables through one link table keyed by compact integers
+
+    facts:     {fact name: DataFrame}
+    keys:      {fact name: columns forming the fact's key into the link table}
+    lookups:   DataFrames whose first column maps to the other columns (e.g. date -> month_year),
+               used to give each fact's key combinations the columns other facts are keyed on
+    key_names: {fact name: name of its surrogate key column}, '<fact>_key' by default
+
+    Returns (link table, {fact name: fact with its key columns replaced by the surrogate key}).
+    The link table has one row per distinct combination from each fact, with every fact's
+    surrogate key where that fact has the combination (missing otherwise).
+    """
+    key_names = {fact: (key_names or {}).get(fact, f'{fact}_key') for fact in facts}
+
+    keyed_facts, combinations = {}, {}
+    for fact, df in facts.items():
+        columns = keys[fact]
+        codes, first = combination_codes(df, columns)
+        keyed = _drop_columns(df, columns)
+        keyed[key_names[fact]] = codes.astype(_key_dtype(len(first)))
+        keyed_facts[fact] = keyed
+
+        # Only the distinct combinations (a small frame) are enriched and joined below
+        distinct = df[columns].iloc[first].reset_index(drop=True)
+        for lookup in lookups:
+            on = lookup.columns[0]
+            attributes = [col for col in lookup.columns[1:] if col not in distinct.columns]
+            if on in distinct.columns and attributes:
+                mapping = lookup.drop_duplicates(subset=on).set_index(on)
+                for attribute in attributes:
+                    distinct[attribute] = distinct[on].map(mapping[attribute])
+        # Link rows from other facts leave these columns missing; nullable integers keep them integer
+        combinations[fact] = distinct.astype({col: NULLABLE_INTEGERS[dtype] for col, dtype in distinct.dtypes.items()
+                                              if dtype in NULLABLE_INTEGERS})
+
+    # Union of every fact's combinations, deduplicated on all link columns
+    link = pd.concat(combinations.values(), ignore_index=True)
+    _, first = combination_codes(link, list(link.columns))
+    link = link.iloc[np.sort(first)].reset_index(drop=True)
+
+    # Each link row points at the key of every fact that has its combination
+    for fact in facts:
+        position = _positions(link, combinations[fact], keys[fact])
+        key = pd.array(position, dtype=NULLABLE_INTEGERS[np.dtype(_key_dtype(len(combinations[fact])))])
+        key[position < 0] = pd.NA
+        link[key_names[fact]] = key
+
+    return link, keyed_facts
@@ -0,0 +1,58 @@
+from cube_alchemy import Hypercube
+from links import build_link_table
+from tables import shallow_copies
+from rollups import DEFAULT_GRAIN, rollup_tables
+
+# Name of the table bridging actuals and budget
+LINK_TABLE = 'Link Actuals - Budget'
+
+
+def _bridge_facts(tables, keys, lookups):
+    # Shallow copies: the renames below and the cube's own in-place changes leave `tables` as it was, without copying data
+    prepared = shallow_copies(tables)
+    for fact in ('actuals', 'budget'):
+        prepared[fact].rename(columns={'amount': f'amount ({fact})'}, inplace=True)
+
+    link_table, keyed_facts = build_link_table(
+        facts={'actuals': prepared['actuals'], 'budget': prepared['budget']},
+        keys=keys,
+        lookups=lookups,
+    )
+    prepared.update(keyed_facts)
+    prepared[LINK_TABLE] = link_table
+    return prepared
+
+
+def prepare_tables(tables):
+    """The P&L tables ready for a Hypercube, as built step by step in example pnl.ipynb:
+    amount columns named after their fact, and actuals and budget bridged by a link table"""
+    return _bridge_facts(
+        tables,
+        keys={'actuals': ['date', 'account_number', 'bu_id'], 'budget': ['month_year', 'pnl_account_name', 'bu_id']},
+        lookups=[tables['calendar_dim'][['date', 'month_year']], tables['accounts'][['account_number', 'pnl_account_name']]],
+    )
+
+
+def prepare_rollup_tables(tables, grain=DEFAULT_GRAIN):
+    """Like prepare_tables, but with actuals and budget rolled up to `grain` (see rollups.py)
+
+    The same metrics and queries work on the resulting cube as long as they only use
+    dimensions available at the grain (the PNL report does at the default grain), and
+    its size no longer depends on the number of transactions. `tables` can be the raw
+    tables or rollups written by rollups.py at the same grain.
+    """
+    rolled, grains = rollup_tables(tables, grain)
+    # The budget grain is part of the actuals grain, so both facts already share their key columns
+    return _bridge_facts(rolled, keys=grains, lookups=())
+
+
+def define_metrics_and_queries(cube: Hypercube):
+    """Metrics and the PNL report query of the P&L example"""
+    cube.define_metric(name='Amount Actual', expression='[amount (actuals)]', aggregation='sum')
+    cube.define_metric(name='Amount Budget', expression='[amount (budget)]', aggregation='sum')
+    cube.define_metric(name='_line_order_avg', expression='[line_order]', aggregation='mean')
+
+    cube.define_computed_metric(name='difference', expression='[Amount Actual] - [Amount Budget]')
+    cube.define_computed_metric(name='percentage_difference', expression='[difference] / [Amount Budget]')
+
+    cube.define_query(name='PNL', metrics=['Amount Actual', 'Amount Budget'], computed_metrics=['difference', 'percentage_difference'], dimensions=['pnl_report_line'], sort=[('_line_order_avg', 'asc')])
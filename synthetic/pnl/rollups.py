@@ -0,0 +1,129 @@
+"""Actuals and budget pre-aggregated to a coarser grain, for report cubes that never touch the transactions
+
+    python rollups.py --grain month_year bu_id pnl_account_name --output_dir data/rollups --output_format parquet
+
+writes the rolled-up actuals and budget with the dimension tables still valid at that grain;
+model.prepare_rollup_tables() builds a cube from them (or rolls raw tables up itself).
+"""
+import os
+import argparse
+import numpy as np
+from links import combination_codes
+
+# Month x business unit x P&L account: the grain the budget is planned at
+DEFAULT_GRAIN = ['month_year', 'bu_id', 'pnl_account_name']
+
+# Row count of the transactions behind each rolled-up actuals row
+COUNT_COLUMN = 'transactions'
+
+
+def determined_columns(df, by):
+    """Distinct rows of `df` on the `by` columns, with every other column that has one value per combination of them
+    (e.g. a calendar by month_year keeps month, quarter and year but not date or day)"""
+    grouped = df.groupby(by, dropna=False, observed=True)
+    others = [col for col in df.columns if col not in by and (grouped[col].nunique(dropna=False) <= 1).all()]
+    return df[by + others].drop_duplicates(subset=by).reset_index(drop=True)
+
+
+def rollup(df, grain, lookups=(), measures=('amount',), count=None):
+    """Sum the measures of a fact table to `grain`
+
+    Grain columns the table lacks are taken from the lookups: DataFrames whose first column
+    maps to the others (like calendar_dim: date -> month_year), joined on the table's distinct
+    key combinations only. With `count`, the rolled-up rows also count the rows behind them
+    (summing the column instead if the table already has it, i.e. is itself a rollup).
+    """
+    measures = list(measures)
+    if count is not None and count in df.columns:
+        measures.append(count)
+
+    via = {}
+    for col in grain:
+        if col in df.columns:
+            continue
+        lookup = next((lookup for lookup in lookups if lookup.columns[0] in df.columns and col in lookup.columns), None)
+        if lookup is None:
+            raise ValueError(f"Grain column '{col}' is neither in the table nor in a lookup keyed on one of its columns")
+        via.setdefault(lookup.columns[0], (lookup, []))[1].append(col)
+
+    # Sum once per distinct combination of the grain columns present and the lookup keys,
+    # so lookups only touch those combinations
+    keys = [col for col in grain if col in df.columns] + [on for on in via if on not in grain]
+    codes, first = combination_codes(df, keys)
+    partial = df[keys].iloc[first].reset_index(drop=True)
+    for measure in measures:
+        partial[measure] = df[measure].groupby(codes).sum().to_numpy()
+    if count is not None and count not in df.columns:
+        partial[count] = np.bincount(codes, minlength=len(first))
+        measures.append(count)
+
+    for on, (lookup, columns) in via.items():
+        mapping = lookup.drop_duplicates(subset=on).set_index(on)
+        for col in columns:
+            partial[col] = partial[on].map(mapping[col])
+
+    return partial.groupby(grain, sort=True, dropna=False, observed=True)[measures].sum().reset_index()
+
+
+def rollup_tables(tables, grain=DEFAULT_GRAIN):
+    """The P&L tables with actuals and budget rolled up to `grain` and the dimension tables that still apply
+
+    grain may use any actuals column and any calendar_dim or accounts attribute (looked up by date
+    and account_number). The budget is rolled up to the part of the grain it has: its own columns
+    and the calendar and account attributes of its months and P&L accounts.
+    Returns (tables, {'actuals': actuals grain, 'budget': budget grain}).
+    """
+    calendar, accounts = tables['calendar_dim'], tables['accounts']
+    # Keyed lookups from the columns the facts have (tables already rolled up may lack them)
+    lookups = [calendar]
+    if 'account_number' in accounts.columns:
+        lookups.append(accounts[['account_number'] + [col for col in accounts.columns if col != 'account_number']])
+    rolled = {'actuals': rollup(tables['actuals'], grain, lookups, count=COUNT_COLUMN)}
+
+    budget_lookups = [determined_columns(table, [key]) for table, key in ((calendar, 'month_year'), (accounts, 'pnl_account_name'))
+                      if key in table.columns]
+    budget_columns = set(tables['budget'].columns).union(*(lookup.columns for lookup in budget_lookups))
+    budget_grain = [col for col in grain if col in budget_columns]
+    rolled['budget'] = rollup(tables['budget'], budget_grain, budget_lookups)
+
+    # Calendar and accounts keep the attributes that are constant at the grain (e.g. quarter for month_year)
+    for name, table in (('calendar_dim', calendar), ('accounts', accounts)):
+        columns = [col for col in grain if col in table.columns]
+        if columns:
+            rolled[name] = determined_columns(table, columns)
+
+    # Other tables join on their first column, when the grain (or the tables above) still has it
+    available = set(grain).union(*(rolled[name].columns for name in ('calendar_dim', 'accounts') if name in rolled))
+    for name, table in tables.items():
+        if name not in rolled and name not in ('calendar_dim', 'accounts', 'budget') and table.columns[0] in available:
+            rolled[name] = table
+
+    return rolled, {'actuals': list(grain), 'budget': budget_grain}
+
+
+def write_rollups(tables, output_dir, grain=DEFAULT_GRAIN, output_format='parquet'):
+    """Materialize rollup_tables() as one file per table, readable with tables.LazyTables(output_dir)"""
+    os.makedirs(output_dir, exist_ok=True)
+    rolled, _ = rollup_tables(tables, grain)
+    for name, df in rolled.items():
+        path = os.path.join(output_dir, f'{name}.{output_format}')
+        if output_format == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            df.to_parquet(path, index=False)
+    return rolled
+
+
+if __name__ == '__main__':
+    from tables import LazyTables, data_dir
+
+    parser = argparse.ArgumentParser(description='Write actuals and budget rolled up to a coarser grain')
+    parser.add_argument('--grain', nargs='+', default=DEFAULT_GRAIN, help='Columns to keep (actuals, calendar or account attributes)')
+    parser.add_argument('--input_dir', type=str, default=data_dir, help='Folder with the generated tables')
+    parser.add_argument('--output_dir', type=str, default=os.path.join(data_dir, 'rollups'), help='Where to write the rollups')
+    parser.add_argument('--output_format', choices=['parquet', 'csv'], default='parquet')
+    args = parser.parse_args()
+
+    rolled = write_rollups(LazyTables(args.input_dir), args.output_dir, args.grain, args.output_format)
+    for name, df in rolled.items():
+        print(f"{name:<20} {len(df):>10,} rows")
@@ -1,4 +1,10 @@
 import os
+import glob
+import json
+import time
+import hashlib
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
 # Get the current directory of the script
@@ -7,21 +13,370 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 # Define the directory where the CSV files are stored
 data_dir = os.path.join(current_dir, 'data')
 
-# Initialize a dictionary to store the DataFrames
-tables = {}
-
-# Iterate through all CSV files in the 'syntetic data' folder
-for filename in os.listdir(data_dir):
-    if filename.endswith(".csv"):
-        # Create the path to the CSV file
-        file_path = os.path.join(data_dir, filename)
-        
-        # Load the CSV file into a DataFrame
-        df = pd.read_csv(file_path)
-        
-        # Use the filename (without extension) as the table name
-        table_name = filename.replace(".csv", "")
-        
-        # Store the DataFrame in the dictionary
-        tables[table_name] = df
+# Parsed tables are cached as Parquet in a .cache folder next to their sources, so a repeated start skips CSV parsing
+CACHE_FOLDER = '.cache'
+cache_dir = os.path.join(data_dir, CACHE_FOLDER)
 
+# Source formats the loader understands (a table may also be a folder of part files)
+SOURCE_EXTENSIONS = ['.csv', '.parquet', '.arrow']
+
+# Filtered CSV reads are scanned in chunks of this many rows, so only matching rows are kept in memory
+CSV_CHUNK_ROWS = 500_000
+
+# Declared schema per table: dtypes (including categoricals) and the columns parsed as dates.
+# Tables without an entry are read with pandas' inferred dtypes.
+SCHEMAS = {
+    'accounts': {
+        'dtype': {'pnl_account_name': 'category', 'pnl_category': 'category', 'account_number': 'int16'},
+    },
+    'actuals': {
+        'dtype': {
+            'account_number': 'int16',
+            'location_id': 'int32',
+            'bu_id': 'int32',
+            'segment': 'category',
+            'amount': 'float64',
+            'cost_center_id': 'Int16',
+            'vendor_id': 'Int16',
+            'project_id': 'Int16',
+        },
+        'parse_dates': ['date'],
+    },
+    'budget': {
+        'dtype': {'month_year': 'category', 'bu_id': 'int32', 'pnl_account_name': 'category', 'amount': 'float64'},
+    },
+    'business_unit_dim': {
+        'dtype': {'bu_id': 'int32', 'business_unit': 'category', 'division': 'category'},
+    },
+    'calendar_dim': {
+        'dtype': {
+            'day': 'int8',
+            'month': 'int8',
+            'month_name': 'category',
+            'quarter': 'int8',
+            'year': 'int16',
+            'month_year': 'category',
+            'day_of_week': 'int8',
+            'day_name': 'category',
+            'week_of_year': 'int8',
+            'is_weekend': 'bool',
+            'is_month_end': 'bool',
+            'is_quarter_end': 'bool',
+            'is_year_end': 'bool',
+        },
+        'parse_dates': ['date'],
+    },
+    'cost_center_dim': {
+        'dtype': {'cost_center_id': 'int16', 'cost_center_type': 'category', 'department': 'category'},
+    },
+    'location_dim': {
+        'dtype': {'location_id': 'int32', 'country': 'category', 'region': 'category'},
+    },
+    'pnl_report_mapping': {
+        'dtype': {'pnl_category': 'category', 'line_order': 'int16', 'is_subtotal': 'bool'},
+    },
+    'project_dim': {
+        'dtype': {'project_id': 'int16', 'project_category': 'category', 'status': 'category'},
+        'parse_dates': ['start_date', 'end_date'],
+    },
+    'vendor_dim': {
+        'dtype': {'vendor_id': 'int16', 'vendor_category': 'category', 'is_preferred': 'category'},
+    },
+}
+
+
+def discover_tables(directory=data_dir):
+    """Map table names to their source files; a folder of part files (actuals/part-*.csv) is one table"""
+    sources = {}
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        name, extension = os.path.splitext(entry)
+        if os.path.isdir(path) and not entry.startswith('.'):
+            parts = sorted(p for p in glob.glob(os.path.join(path, 'part-*')) if os.path.splitext(p)[1] in SOURCE_EXTENSIONS)
+            if parts:
+                sources.setdefault(entry, []).append(parts)
+        elif extension in SOURCE_EXTENSIONS:
+            sources.setdefault(name, []).append([path])
+
+    # When a table exists in several formats, the most recently written one wins
+    return {name: max(candidates, key=lambda paths: max(os.path.getmtime(p) for p in paths))
+            for name, candidates in sources.items()}
+
+
+def _apply_schema(df, schema):
+    """Cast the columns a schema declares, leaving the others as read"""
+    dtypes = {col: dtype for col, dtype in schema.get('dtype', {}).items() if col in df.columns}
+    df = df.astype(dtypes)
+    for col in schema.get('parse_dates', []):
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def _filter_mask(df, filters):
+    """Boolean mask for pyarrow-style filters: a list of (column, op, value) tuples, all of which must hold"""
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        values = df[col]
+        if op in ('==', '='):
+            mask &= values == value
+        elif op == '!=':
+            mask &= values != value
+        elif op == '<':
+            mask &= values < value
+        elif op == '<=':
+            mask &= values <= value
+        elif op == '>':
+            mask &= values > value
+        elif op == '>=':
+            mask &= values >= value
+        elif op == 'in':
+            mask &= values.isin(value)
+        elif op == 'not in':
+            mask &= ~values.isin(value)
+        else:
+            raise ValueError(f"Unsupported filter operator '{op}'")
+    return mask
+
+
+def _read_csv(path, schema, columns=None, filters=None):
+    """Read a CSV straight into the declared dtypes, keeping only the requested columns and matching rows"""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = None
+    if columns is not None:
+        needed = set(columns) | {col for col, _, _ in filters or []}
+        usecols = [col for col in header if col in needed]
+    dtype = {col: t for col, t in schema.get('dtype', {}).items() if col in header}
+    parse_dates = [col for col in schema.get('parse_dates', []) if col in header and (usecols is None or col in usecols)]
+
+    if not filters:
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, parse_dates=parse_dates)
+
+    # Scan in chunks and keep only the matching rows; categoricals are cast once at the end
+    # so every chunk doesn't come with its own categories
+    chunk_dtype = {col: ('object' if t == 'category' else t) for col, t in dtype.items()}
+    reader = pd.read_csv(path, usecols=usecols, dtype=chunk_dtype, parse_dates=parse_dates, chunksize=CSV_CHUNK_ROWS)
+    df = pd.concat([chunk[_filter_mask(chunk, filters)] for chunk in reader], ignore_index=True)
+    if columns is not None:
+        df = df[[col for col in usecols if col in columns]]
+    return _apply_schema(df, schema)
+
+
+def _read_source(path, schema, columns=None, filters=None):
+    """Read one source file with the declared dtypes, pushing column projection and row filters to the reader"""
+    extension = os.path.splitext(path)[1]
+    if extension == '.csv':
+        return _read_csv(path, schema, columns, filters)
+    if extension == '.parquet':
+        return _apply_schema(pd.read_parquet(path, columns=columns, filters=filters or None), schema)
+
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    expression = pq.filters_to_expression(filters) if filters else None
+    return _apply_schema(ds.dataset(path, format='ipc').to_table(columns=columns, filter=expression).to_pandas(), schema)
+
+
+def _file_digest(paths):
+    """Content hash of a table's source files"""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(name, directory):
+    return os.path.join(directory, f'{name}.parquet'), os.path.join(directory, f'{name}.json')
+
+
+def _read_cached(name, paths, schema, directory, columns=None, filters=None):
+    """Return the cached frame if the sources still match it (mtime first, content hash as fallback)"""
+    cache_file, manifest_file = _cache_paths(name, directory)
+    if not (os.path.exists(cache_file) and os.path.exists(manifest_file)):
+        return None
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    if manifest.get('paths') != paths or manifest.get('schema') != repr(schema):
+        return None
+
+    mtimes = [os.stat(p).st_mtime_ns for p in paths]
+    if manifest.get('mtimes') != mtimes:
+        # Touched but possibly unchanged: fall back to the content hash
+        if manifest.get('digest') != _file_digest(paths):
+            return None
+        manifest['mtimes'] = mtimes
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f)
+    return pd.read_parquet(cache_file, columns=columns, filters=filters or None)
+
+
+def _write_cache(name, paths, schema, df, directory):
+    cache_file, manifest_file = _cache_paths(name, directory)
+    os.makedirs(directory, exist_ok=True)
+    # Written under temporary names and moved in place, so concurrent loads never read half a file
+    suffix = f'.{os.getpid()}.tmp'
+    df.to_parquet(cache_file + suffix, index=False)
+    with open(manifest_file + suffix, 'w') as f:
+        json.dump({
+            'paths': paths,
+            'schema': repr(schema),
+            'mtimes': [os.stat(p).st_mtime_ns for p in paths],
+            'digest': _file_digest(paths),
+        }, f)
+    os.replace(cache_file + suffix, cache_file)
+    os.replace(manifest_file + suffix, manifest_file)
+
+
+def load_table(name, paths, schema=None, use_cache=True, columns=None, filters=None, cache_dir=None):
+    """Load one table from its source files, returning (DataFrame, where it came from, seconds)
+
+    columns and filters (pyarrow-style (column, op, value) tuples) are pushed
+    down to the reader. Only full CSV loads write the cache (in cache_dir, by
+    default .cache next to the sources), but projected and filtered loads read
+    from it when it is valid.
+    """
+    schema = schema or {}
+    cache_dir = cache_dir or os.path.join(os.path.dirname(paths[0]), CACHE_FOLDER)
+    start = time.perf_counter()
+    # Only CSV parsing is worth caching, columnar sources are read directly
+    cacheable = use_cache and any(p.endswith('.csv') for p in paths)
+    partial = columns is not None or bool(filters)
+
+    df = _read_cached(name, paths, schema, cache_dir, columns, filters) if cacheable else None
+    origin = 'cache'
+    if df is None:
+        frames = [_read_source(p, schema, columns, filters) for p in paths]
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        origin = os.path.splitext(paths[0])[1].lstrip('.')
+        if cacheable and not partial:
+            try:
+                _write_cache(name, paths, schema, df, cache_dir)
+            except ImportError:
+                # No Parquet engine installed: keep working without the cache
+                pass
+    return df, origin, time.perf_counter() - start
+
+
+def load_tables(directory=data_dir, schemas=SCHEMAS, names=None, max_workers=None, use_cache=True, verbose=False):
+    """Load the tables of a data folder concurrently on a thread pool
+
+    Each table is parsed with its declared schema. Parsed CSVs are cached as
+    Parquet in the folder's .cache, keyed by the source mtime and content hash,
+    so a warm start skips CSV parsing entirely. With verbose=True the per-table
+    timings are printed.
+    """
+    sources = discover_tables(directory)
+    folder_cache = os.path.join(directory, CACHE_FOLDER)
+    if names is not None:
+        sources = {name: sources[name] for name in names}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(load_table, name, paths, schemas.get(name), use_cache, cache_dir=folder_cache)
+                   for name, paths in sources.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    if verbose:
+        for name, (df, origin, seconds) in results.items():
+            print(f"{name:<20} {len(df):>10,} rows  {origin:<8} {seconds * 1000:8.1f} ms")
+        print(f"Loaded {len(results)} tables in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    return {name: df for name, (df, _, _) in results.items()}
+
+
+def shallow_copies(tables):
+    """New frames sharing the column data of the tables, to rename, re-type or hand to a Hypercube
+    (which resets indexes and adds columns in place) without touching the originals or copying data"""
+    return {name: df.copy(deep=False) for name, df in tables.items()}
+
+
+class LazyTables(MutableMapping):
+    """Dict-like view of a data folder that loads each table on first access
+
+    Only the table names are discovered up front. tables['actuals'] loads (and
+    keeps) the full table; tables.load() reads just some columns and/or rows
+    without keeping them. Tables can also be assigned, like in a plain dict.
+    """
+
+    def __init__(self, directory=data_dir, schemas=SCHEMAS, use_cache=True):
+        self.directory = directory
+        self.schemas = schemas
+        self.use_cache = use_cache
+        self.cache_dir = os.path.join(directory, CACHE_FOLDER)
+        self._sources = discover_tables(directory)
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            if name not in self._sources:
+                raise KeyError(name)
+            self._loaded[name], _, _ = load_table(name, self._sources[name], self.schemas.get(name), self.use_cache,
+                                                  cache_dir=self.cache_dir)
+        return self._loaded[name]
+
+    def __setitem__(self, name, df):
+        self._loaded[name] = df
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self._loaded.pop(name, None)
+        self._sources.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._loaded or name in self._sources
+
+    def __iter__(self):
+        yield from self._sources
+        yield from (name for name in self._loaded if name not in self._sources)
+
+    def __len__(self):
+        return len(set(self._sources) | set(self._loaded))
+
+    def __repr__(self):
+        return f"LazyTables({list(self)}, loaded={self.loaded()})"
+
+    def loaded(self):
+        """Names of the tables currently held in memory"""
+        return list(self._loaded)
+
+    def load(self, name, columns=None, filters=None):
+        """Read a projection of a table without keeping it, e.g.
+
+        tables.load('actuals', columns=['date', 'amount'], filters=[('bu_id', 'in', [1, 2])])
+        """
+        if name in self._loaded:
+            df = self._loaded[name]
+            if filters:
+                df = df[_filter_mask(df, filters)]
+            return df if columns is None else df[columns]
+        df, _, _ = load_table(name, self._sources[name], self.schemas.get(name), self.use_cache, columns, filters,
+                              self.cache_dir)
+        return df
+
+    def preload(self, names=None, max_workers=None):
+        """Load several tables at once on a thread pool (all of them by default)"""
+        pending = [name for name in (names or self._sources) if name not in self._loaded]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {name: executor.submit(load_table, name, self._sources[name], self.schemas.get(name), self.use_cache,
+                                             cache_dir=self.cache_dir)
+                       for name in pending}
+            for name, future in futures.items():
+                self._loaded[name] = future.result()[0]
+        return self
+
+
+# Tables keyed by file name (without extension), each one loaded on first access
+tables = LazyTables()
+
+
+# Run directly to report cold (no cache) and warm load times
+if __name__ == "__main__":
+    import shutil
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    print("Cold load:")
+    load_tables(verbose=True)
+    print("\nWarm load:")
+    load_tables(verbose=True)